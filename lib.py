@@ -1,9 +1,95 @@
-def sum_objects(a, b):
+import decimal
+import math
+import mmap
+import numbers
+import operator
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from fractions import Fraction
+from functools import reduce, wraps
+from itertools import accumulate, chain, islice
+from types import GeneratorType
+
+_NO_START = object()
+
+
+def _optional_numpy():
+    """Return the numpy module, or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# Handlers registered for (type_a, type_b) pairs, and the handler resolved for
+# each pair of concrete operand types seen so far (None meaning plain ``+``).
+_registry = {}
+_dispatch_cache = {}
+
+
+def register(type_a, type_b):
+    """Register a function that sums objects of two given types.
+
+    Registered handlers apply to subclasses as well. When several handlers
+    match, the one for the most specific type of the first operand wins, and
+    then the most specific type of the second operand.
+
+    Args:
+        type_a: Type of the first object
+        type_b: Type of the second object
+
+    Returns:
+        A decorator that registers a function ``f(a, b)`` and returns it
+        unchanged
+    """
+
+    def decorator(func):
+        _registry[type_a, type_b] = func
+        _dispatch_cache.clear()
+        return func
+
+    return decorator
+
+
+def _resolve(type_a, type_b):
+    for base_a in type_a.__mro__:
+        for base_b in type_b.__mro__:
+            handler = _registry.get((base_a, base_b))
+            if handler is not None:
+                return handler
+    return None
+
+
+def _dispatch(type_a, type_b):
+    try:
+        return _dispatch_cache[type_a, type_b]
+    except KeyError:
+        handler = _dispatch_cache[type_a, type_b] = _resolve(type_a, type_b)
+        return handler
+
+
+def sum_objects(a, b, *, lazy=False):
     """Sum two objects together.
 
+    Objects whose types have a handler registered with ``register`` are summed
+    by that handler, all others with ``+``.
+
     Args:
         a: First object to sum
         b: Second object to sum
+        lazy: If true and a is a str or list, return a ``Rope`` that defers
+            the concatenation instead of copying both operands
 
     Returns:
         The sum of a and b
@@ -11,4 +97,2704 @@ def sum_objects(a, b):
     Raises:
         TypeError: If the objects cannot be summed
     """
+    if lazy and type(a) in (str, list):
+        a = Rope(a)
+    if _registry:
+        handler = _dispatch(type(a), type(b))
+        if handler is not None:
+            return handler(a, b)
     return a + b
+
+
+def _join_str(start, items):
+    return "".join([start, *items])
+
+
+def _join_bytes(start, items):
+    return b"".join([start, *items])
+
+
+def _join_bytearray(start, items):
+    return bytearray().join([start, *items])
+
+
+def _extend_list(start, items):
+    result = list(start)
+    for item in items:
+        result.extend(item)
+    return result
+
+
+def _sum_int(start, items):
+    return sum(items, start)
+
+
+def _sum_fraction(start, items):
+    return sum_fractions(items, start)
+
+
+# Linear-time strategies for sequences whose start value and items all share
+# exactly one of these types. Subclasses are deliberately excluded because they
+# may override __add__.
+_FAST_PATHS = {
+    str: _join_str,
+    bytes: _join_bytes,
+    bytearray: _join_bytearray,
+    list: _extend_list,
+    int: _sum_int,
+    Fraction: _sum_fraction,
+}
+
+
+def sum_many(iterable, start=_NO_START):
+    """Sum all objects of an iterable from left to right.
+
+    The result is the same as folding ``sum_objects`` over the items, but
+    homogeneous inputs of ``str``, ``bytes``, ``bytearray``, ``list``, ``int``
+    or ``Fraction`` are combined in bulk instead of copying or renormalizing
+    the accumulator at every step. Mixed or user-defined types fall back to
+    pairwise ``+``.
+
+    Args:
+        iterable: Objects to sum
+        start: Initial value of the sum. Defaults to the first item.
+
+    Returns:
+        The sum of start and all items
+
+    Raises:
+        TypeError: If the objects cannot be summed, or if the iterable is
+            empty and no start value was given
+    """
+    items = list(iterable)
+    if start is _NO_START:
+        if not items:
+            raise TypeError("sum_many() of empty iterable with no start value")
+        start = items.pop(0)
+
+    if not items:
+        return start
+
+    fast_path = _fast_path(start, items)
+    if fast_path is not None:
+        return fast_path(start, items)
+    return reduce(sum_objects, items, start)
+
+
+def _fast_path(start, items):
+    # Return the bulk strategy for summing the items onto start, if any.
+    types = set(map(type, items))
+    if len(types) != 1:
+        return None
+    item_type = types.pop()
+    fast_path = _FAST_PATHS.get(item_type)
+    if (
+        fast_path is None
+        or type(start) is not item_type
+        or (_registry and _dispatch(item_type, item_type))
+    ):
+        return None
+    return fast_path
+
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def running_sums(iterable, start=_NO_START, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lazily sum an iterable chunk by chunk, yielding the total after each chunk.
+
+    At most one chunk of items is held in memory at a time, and each chunk is
+    added with ``sum_many`` so that it uses the same fast paths.
+
+    Args:
+        iterable: Objects to sum
+        start: Initial value of the sum. Defaults to the first item.
+        chunk_size: Number of items to consume per chunk
+
+    Yields:
+        The running total after each chunk
+
+    Raises:
+        TypeError: If the objects cannot be summed
+        ValueError: If chunk_size is smaller than one
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    iterator = iter(iterable)
+    total = start
+    while chunk := list(islice(iterator, chunk_size)):
+        total = sum_many(chunk, total)
+        yield total
+
+
+def prefix_sums(iterable, start=_NO_START):
+    """Lazily compute the running total after every item of an iterable.
+
+    Args:
+        iterable: Objects to sum
+        start: Initial value of the sum. Defaults to the first item.
+
+    Returns:
+        An iterator over the running total after each item
+
+    Raises:
+        TypeError: If the objects cannot be summed
+    """
+    if start is _NO_START:
+        return accumulate(iterable, sum_objects)
+    return islice(accumulate(iterable, sum_objects, initial=start), 1, None)
+
+
+def sum_stream(iterable, start=_NO_START, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Sum an iterable of any length with bounded memory.
+
+    Args:
+        iterable: Objects to sum
+        start: Initial value of the sum. Defaults to the first item.
+        chunk_size: Number of items to consume per chunk
+
+    Returns:
+        The sum of start and all items
+
+    Raises:
+        TypeError: If the objects cannot be summed, or if the iterable is
+            empty and no start value was given
+        ValueError: If chunk_size is smaller than one
+    """
+    total = start
+    for total in running_sums(iterable, start, chunk_size):
+        pass
+    if total is _NO_START:
+        raise TypeError("sum_stream() of empty iterable with no start value")
+    return total
+
+
+# Starting a process pool costs about as much as serially reducing 10^5
+# objects with a Python-level __add__, so smaller inputs are reduced in place.
+# Inputs that sum_many combines in bulk are reduced faster than they are
+# pickled for a worker, so they are always reduced in place by default.
+PARALLEL_THRESHOLD = 1 << 17
+
+# Number of shards per worker, so that uneven shards still balance out.
+_SHARDS_PER_WORKER = 4
+
+
+def _tree_reduce(partials):
+    while len(partials) > 1:
+        paired = [
+            sum_objects(left, right)
+            for left, right in zip(partials[::2], partials[1::2])
+        ]
+        if len(partials) % 2:
+            paired.append(partials[-1])
+        partials = paired
+    return partials[0]
+
+
+def _default_executor():
+    # Handlers registered at runtime do not exist in worker processes that
+    # are spawned rather than forked, so registries require threads.
+    if _registry:
+        return "thread"
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    return "process" if gil_enabled else "thread"
+
+
+def sum_parallel(
+    iterable,
+    start=_NO_START,
+    workers=None,
+    shard_size=None,
+    executor=None,
+    threshold=None,
+):
+    """Sum a large iterable on several cores.
+
+    The items are split into contiguous shards that are reduced with
+    ``sum_many`` in a worker pool. The partial sums are then combined in a
+    balanced tree that keeps the left-to-right order, so non-commutative types
+    such as ``str`` and ``list`` give the same result as ``sum_many``. The
+    grouping of additions does change, so floats may round differently.
+
+    Args:
+        iterable: Objects to sum. They must be picklable for a process pool.
+        start: Initial value of the sum. Defaults to the first item.
+        workers: Number of workers. Defaults to the number of usable CPUs.
+        shard_size: Number of items per shard. Defaults to spreading the
+            items over a few shards per worker.
+        executor: ``"process"`` or ``"thread"``. Defaults to threads on
+            free-threaded builds with the GIL disabled or when handlers are
+            registered, and processes otherwise. Worker processes do not see
+            handlers registered at runtime unless they are forked.
+        threshold: Inputs with fewer items are summed serially. Defaults to
+            ``PARALLEL_THRESHOLD``, except that inputs ``sum_many`` combines
+            in bulk, such as only ints or only strs, are always summed
+            serially.
+
+    Returns:
+        The sum of start and all items
+
+    Raises:
+        TypeError: If the objects cannot be summed, or if the iterable is
+            empty and no start value was given
+        ValueError: If the executor is unknown, or workers or shard_size is
+            smaller than one
+    """
+    if workers is not None and workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if shard_size is not None and shard_size < 1:
+        raise ValueError(f"shard_size must be at least 1, got {shard_size}")
+    # Importing the process pool pulls in multiprocessing, so only do it here.
+    from concurrent.futures import ProcessPoolExecutor
+
+    if executor is None:
+        executor = _default_executor()
+    executors = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+    if executor not in executors:
+        raise ValueError(f"executor must be one of {tuple(executors)}")
+
+    items = list(iterable)
+    if workers is None:
+        workers = os.process_cpu_count() or 1
+    if threshold is None:
+        first = items[0] if start is _NO_START and items else start
+        if _fast_path(first, items) is not None:
+            return sum_many(items, start)
+        threshold = PARALLEL_THRESHOLD
+    if len(items) < max(threshold, 2) or workers < 2:
+        return sum_many(items, start)
+
+    if shard_size is None:
+        shard_size = -(-len(items) // (workers * _SHARDS_PER_WORKER))
+    shards = [
+        items[index : index + shard_size] for index in range(0, len(items), shard_size)
+    ]
+    with executors[executor](max_workers=workers) as pool:
+        partials = list(pool.map(sum_many, shards))
+
+    total = _tree_reduce(partials)
+    return total if start is _NO_START else sum_objects(start, total)
+
+
+def _as_numeric_array(np, column):
+    if isinstance(column, np.ndarray):
+        return column if column.dtype != object else None
+    if isinstance(column, (array, memoryview)):
+        return np.asarray(column)
+    if isinstance(column, (int, float, complex)):
+        return column
+    return None
+
+
+def sum_objects_batch(as_, bs, out=None):
+    """Sum two columns of objects elementwise.
+
+    When numpy is installed and both columns are numeric arrays or buffers
+    (``numpy.ndarray``, ``array.array`` or ``memoryview``), the sum is computed
+    by a single ``numpy.add`` call, which broadcasts exactly like ``a + b`` on
+    arrays, including against a plain number. Any other columns are summed
+    pair by pair with ``sum_objects``.
+
+    Args:
+        as_: First column of objects
+        bs: Second column of objects
+        out: Optional array or mutable sequence to store the results in
+
+    Returns:
+        The elementwise sums, as an array for numeric input and as a list
+        otherwise. If ``out`` is given, it is filled and returned.
+
+    Raises:
+        TypeError: If a pair of objects cannot be summed
+        ValueError: If the columns have different lengths or shapes
+    """
+    # Plain sequences never need numpy, so avoid importing it just for them.
+    buffers = (array, memoryview)
+    needs_numpy = isinstance(as_, buffers) or isinstance(bs, buffers)
+    np = _optional_numpy() if needs_numpy else sys.modules.get("numpy")
+    if np is not None:
+        a_array = _as_numeric_array(np, as_)
+        b_array = _as_numeric_array(np, bs)
+        if (
+            a_array is not None
+            and b_array is not None
+            and (np.ndim(a_array) or np.ndim(b_array))
+        ):
+            return np.add(a_array, b_array, out=out)
+
+    results = [sum_objects(a, b) for a, b in zip(as_, bs, strict=True)]
+    if out is None:
+        return results
+    if len(out) != len(results):
+        raise ValueError(f"out has length {len(out)}, expected {len(results)}")
+    for index, result in enumerate(results):
+        out[index] = result
+    return out
+
+
+FLOAT_SUM_MODES = ("naive", "pairwise", "kahan", "exact")
+
+# Leaf block size of the pairwise mode, the same as numpy's.
+_PAIRWISE_BLOCK_SIZE = 128
+
+# Numpy arrays at least this large default to numpy's pairwise summation;
+# everything else defaults to math.fsum, which costs well under twice a plain
+# builtin sum.
+_PAIRWISE_DEFAULT_THRESHOLD = 1 << 16
+
+_UNIT_ROUNDOFF = sys.float_info.epsilon / 2
+
+
+def _sum_naive(values):
+    return reduce(operator.add, values, 0.0)
+
+
+def _sum_pairwise(values):
+    # Sum fixed-size blocks naively and combine the block sums like a binary
+    # counter, so that streamed input is reduced as a balanced tree.
+    levels = []
+    iterator = iter(values)
+    while block := list(islice(iterator, _PAIRWISE_BLOCK_SIZE)):
+        partial = _sum_naive(block)
+        level = 0
+        while level < len(levels) and levels[level] is not None:
+            partial = levels[level] + partial
+            levels[level] = None
+            level += 1
+        if level == len(levels):
+            levels.append(partial)
+        else:
+            levels[level] = partial
+    return reduce(
+        lambda total, partial: partial + total,
+        (partial for partial in levels if partial is not None),
+        0.0,
+    )
+
+
+def _sum_kahan(values):
+    # The builtin sum uses Neumaier's improved Kahan compensation for floats.
+    return sum(values, 0.0)
+
+
+_FLOAT_SUMMERS = {
+    "naive": _sum_naive,
+    "pairwise": _sum_pairwise,
+    "kahan": _sum_kahan,
+    "exact": math.fsum,
+}
+
+
+def _float_error_bound(mode, count, abs_total, total):
+    u = _UNIT_ROUNDOFF
+    if mode == "exact":
+        return u * abs(total)
+    if mode == "kahan":
+        return (2 * u + 2 * count * u * u) * abs_total
+    if mode == "pairwise":
+        blocks = -(-count // _PAIRWISE_BLOCK_SIZE)
+        steps = min(count, _PAIRWISE_BLOCK_SIZE) - 1 + math.ceil(math.log2(blocks or 1))
+    else:
+        steps = count - 1
+    steps = max(steps, 0)
+    return steps * u / (1 - steps * u) * abs_total
+
+
+def sum_floats(values, mode=None, chunked=False, error_bound=False):
+    """Sum floats with a selectable accuracy/speed trade-off.
+
+    The modes are ``"naive"`` (left to right, like folding ``sum_objects``),
+    ``"pairwise"`` (blocked tree summation as in numpy), ``"kahan"``
+    (compensated summation) and ``"exact"`` (correctly rounded, using
+    ``math.fsum``). By default large numpy arrays use numpy's pairwise sum and
+    everything else is summed exactly.
+
+    Args:
+        values: Iterable of floats, or of chunks of floats if ``chunked``
+        mode: One of ``FLOAT_SUM_MODES``, or None to pick one by input size
+        chunked: Whether ``values`` yields sequences or arrays of floats
+        error_bound: Whether to also return a bound on the absolute error
+
+    Returns:
+        The sum of the values, or a ``(total, bound)`` tuple if
+        ``error_bound`` is true
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode is not None and mode not in _FLOAT_SUMMERS:
+        raise ValueError(f"mode must be one of {FLOAT_SUM_MODES}, got {mode!r}")
+    # An ndarray can only have been created if numpy was already imported.
+    np = sys.modules.get("numpy")
+    if chunked:
+        # The builtin sum only compensates Python floats, not numpy scalars.
+        if np is not None:
+            values = (
+                chunk.tolist() if isinstance(chunk, np.ndarray) else chunk
+                for chunk in values
+            )
+        values = chain.from_iterable(values)
+
+    is_numpy = np is not None and isinstance(values, np.ndarray)
+    if mode is None:
+        large = is_numpy and values.size >= _PAIRWISE_DEFAULT_THRESHOLD
+        mode = "pairwise" if large else "exact"
+
+    if is_numpy:
+        values = values.ravel()
+        if mode != "pairwise":
+            values = values.tolist()
+    elif error_bound and not isinstance(values, (list, tuple, array)):
+        values = list(values)
+
+    if is_numpy and mode == "pairwise":
+        total = float(values.sum(dtype=np.float64))
+    else:
+        total = _FLOAT_SUMMERS[mode](values)
+
+    if not error_bound:
+        return total
+    abs_total = math.fsum(map(abs, values))
+    return total, _float_error_bound(mode, len(values), abs_total, total)
+
+
+def sum_nested(
+    obj,
+    start=0,
+    leaf_types=numbers.Number,
+    container_types=(list, tuple, GeneratorType),
+):
+    """Sum all leaves of an arbitrarily deep nested structure.
+
+    The structure is walked depth first with an explicit stack of iterators,
+    so deep nesting cannot hit the recursion limit and no flattened copy is
+    built. Leaves are added left to right in batches through ``sum_many``.
+    Objects that are neither leaves nor containers are skipped.
+
+    Args:
+        obj: A leaf or a container of leaves and nested containers
+        start: Initial value of the sum
+        leaf_types: Type or tuple of types that are summed. Defaults to all
+            numbers, including ``Fraction``, ``Decimal`` and numpy scalars.
+        container_types: Type or tuple of iterable types that are descended into
+
+    Returns:
+        The sum of start and all leaves
+
+    Raises:
+        TypeError: If the leaves cannot be summed
+    """
+    if isinstance(obj, leaf_types):
+        return sum_objects(start, obj)
+    if not isinstance(obj, container_types):
+        return start
+
+    # Exact types of the leaves seen so far, which may be subclasses or
+    # virtual subclasses of the leaf types.
+    exact_leaf_types = set()
+
+    def only_leaves(items):
+        item_types = set(map(type, items))
+        if exact_leaf_types.issuperset(item_types):
+            return True
+        if all(issubclass(item_type, leaf_types) for item_type in item_types):
+            exact_leaf_types.update(item_types)
+            return True
+        return False
+
+    total = start
+    leaves = []
+    stack = [iter(obj)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, container_types):
+                # Lists and tuples that hold only leaves are taken in one step.
+                if type(item) in (list, tuple) and only_leaves(item):
+                    leaves.extend(item)
+                else:
+                    stack.append(iter(item))
+                    break
+            elif type(item) in exact_leaf_types or isinstance(item, leaf_types):
+                leaves.append(item)
+            if len(leaves) >= DEFAULT_CHUNK_SIZE:
+                total = sum_many(leaves, total)
+                leaves.clear()
+        else:
+            stack.pop()
+    return sum_many(leaves, total)
+
+
+_MISSING_TAG, _INT_TAG, _FLOAT_TAG, _STR_TAG, _BYTES_TAG = range(5)
+_ACCUMULATOR_FORMAT_VERSION = 1
+
+
+def _encode_value(value):
+    if value is _NO_START or value is None:
+        return bytes([_MISSING_TAG])
+    if type(value) is int:
+        payload = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+        return struct.pack("<BI", _INT_TAG, len(payload)) + payload
+    if type(value) is float:
+        return struct.pack("<Bd", _FLOAT_TAG, value)
+    if type(value) is str:
+        payload = value.encode("utf-8")
+        return struct.pack("<BI", _STR_TAG, len(payload)) + payload
+    if type(value) is bytes:
+        return struct.pack("<BI", _BYTES_TAG, len(value)) + value
+    raise TypeError(f"cannot serialize values of type {type(value).__name__}")
+
+
+def _decode_value(data, offset):
+    tag = data[offset]
+    offset += 1
+    if tag == _MISSING_TAG:
+        return None, offset
+    if tag == _FLOAT_TAG:
+        (value,) = struct.unpack_from("<d", data, offset)
+        return value, offset + 8
+    (size,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    payload = bytes(data[offset : offset + size])
+    if len(payload) != size:
+        raise ValueError("truncated value")
+    offset += size
+    if tag == _INT_TAG:
+        return int.from_bytes(payload, "little", signed=True), offset
+    if tag == _STR_TAG:
+        return payload.decode("utf-8"), offset
+    if tag == _BYTES_TAG:
+        return payload, offset
+    raise ValueError(f"unknown value tag {tag}")
+
+
+class Accumulator:
+    """Running sum of objects that can be merged with other partial sums.
+
+    Besides the total, the accumulator keeps the number of values added and
+    the smallest and largest of them. Values that cannot be ordered, such as
+    complex numbers, are summed all the same, but then the smallest and
+    largest values are no longer tracked.
+
+    Attributes:
+        count: Number of values added
+        min: Smallest value added, or None if there is none or the values
+            cannot be ordered
+        max: Largest value added, or None if there is none or the values
+            cannot be ordered
+    """
+
+    __slots__ = ("_total", "count", "min", "max", "_ordered")
+
+    def __init__(self, start=_NO_START):
+        """Create an accumulator.
+
+        Args:
+            start: Initial value of the sum. Defaults to the first value added.
+        """
+        self._total = start
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._ordered = True
+
+    def add(self, value):
+        """Add one value to the sum.
+
+        Args:
+            value: Object to add
+
+        Returns:
+            The accumulator itself
+
+        Raises:
+            TypeError: If the value cannot be summed with the total
+        """
+        if self._total is _NO_START:
+            total = value
+        else:
+            total = sum_objects(self._total, value)
+        self._update(total, 1, True, value, value)
+        return self
+
+    def add_many(self, iterable):
+        """Add all values of an iterable to the sum.
+
+        Args:
+            iterable: Objects to add
+
+        Returns:
+            The accumulator itself
+
+        Raises:
+            TypeError: If the values cannot be summed with the total
+        """
+        values = list(iterable)
+        if not values:
+            return self
+        total = sum_many(values, self._total)
+        try:
+            self._update(total, len(values), True, min(values), max(values))
+        except (TypeError, ValueError):
+            self._update(total, len(values), False, None, None)
+        return self
+
+    def merge(self, other):
+        """Add the partial sum of another accumulator to this one.
+
+        Args:
+            other: Accumulator whose values come after the values of this one
+
+        Returns:
+            The accumulator itself
+
+        Raises:
+            TypeError: If the totals cannot be summed
+        """
+        total = self._total
+        if other._total is not _NO_START:
+            if total is _NO_START:
+                total = other._total
+            else:
+                total = sum_objects(total, other._total)
+        self._update(total, other.count, other._ordered, other.min, other.max)
+        return self
+
+    def _update(self, total, count, ordered, smallest, largest):
+        # Only change the state once nothing can raise any more, so that a
+        # failed addition leaves the accumulator as it was.
+        ordered = ordered and self._ordered
+        if ordered and count and self.count:
+            try:
+                smallest = min(self.min, smallest)
+                largest = max(self.max, largest)
+            except (TypeError, ValueError):
+                ordered = False
+        elif not count:
+            smallest, largest = self.min, self.max
+        if not ordered:
+            smallest = largest = None
+        self._total = total
+        self.count += count
+        self.min, self.max = smallest, largest
+        self._ordered = ordered
+
+    def result(self):
+        """Return the sum of all values added so far.
+
+        Raises:
+            TypeError: If no values were added and no start value was given
+        """
+        if self._total is _NO_START:
+            raise TypeError("result() of empty Accumulator with no start value")
+        return self._total
+
+    def to_bytes(self):
+        """Serialize the accumulator to a compact binary string.
+
+        Only ``int``, ``float``, ``str`` and ``bytes`` totals and statistics
+        can be serialized.
+
+        Returns:
+            The serialized accumulator
+
+        Raises:
+            TypeError: If a value cannot be serialized
+        """
+        return b"".join(
+            [
+                struct.pack("<BQ", _ACCUMULATOR_FORMAT_VERSION, self.count),
+                _encode_value(self._total),
+                _encode_value(self.min),
+                _encode_value(self.max),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Deserialize an accumulator created by ``to_bytes``.
+
+        Args:
+            data: Bytes-like object returned by ``to_bytes``
+
+        Returns:
+            A new accumulator
+
+        Raises:
+            ValueError: If the data is not a serialized accumulator
+        """
+        try:
+            version, count = struct.unpack_from("<BQ", data)
+            if version != _ACCUMULATOR_FORMAT_VERSION:
+                raise ValueError(f"unsupported format version {version}")
+            offset = struct.calcsize("<BQ")
+            total, offset = _decode_value(data, offset)
+            smallest, offset = _decode_value(data, offset)
+            largest, offset = _decode_value(data, offset)
+        except (struct.error, IndexError) as error:
+            raise ValueError("truncated accumulator data") from error
+
+        accumulator = cls()
+        accumulator._total = _NO_START if total is None else total
+        accumulator.count = count
+        accumulator.min = smallest
+        accumulator.max = largest
+        accumulator._ordered = count == 0 or smallest is not None
+        return accumulator
+
+    def __repr__(self):
+        total = None if self._total is _NO_START else self._total
+        return (
+            f"{type(self).__name__}(total={total!r}, count={self.count}, "
+            f"min={self.min!r}, max={self.max!r})"
+        )
+
+
+def _combine(a, b):
+    # Order-preserving sum that treats _NO_START as an empty operand.
+    if a is _NO_START:
+        return b
+    if b is _NO_START:
+        return a
+    return sum_objects(a, b)
+
+
+# Types whose subtraction exactly undoes an addition. Others such as floats,
+# Decimals and numpy arrays support subtraction too, but subtracting evicted
+# values would let rounding errors accumulate in a long-running window.
+_EXACTLY_INVERTIBLE_TYPES = frozenset({int, bool, Fraction})
+
+
+def _is_exactly_invertible(value):
+    return type(value) in _EXACTLY_INVERTIBLE_TYPES
+
+
+class SlidingWindowSum:
+    """Sum of the most recent values appended, up to a fixed window size.
+
+    Values that support exact subtraction (ints and Fractions) are kept in a
+    ring buffer and evicted values are subtracted from the total. Other values
+    (such as floats, Decimals, strings and lists) use two-stack aggregation,
+    which the window switches to for good once such a value is appended.
+    Both take an amortized constant number of ``sum_objects`` calls per
+    append.
+    """
+
+    __slots__ = (
+        "size",
+        "_start",
+        "_invertible",
+        "_checked",
+        "_values",
+        "_next",
+        "_total",
+        "_front",
+    )
+
+    def __init__(self, size, start=_NO_START, invertible=None):
+        """Create an empty window.
+
+        Args:
+            size: Maximum number of values in the window
+            start: Value added in front of the window sum
+            invertible: Whether to evict values by subtraction. Defaults to
+                subtracting as long as all values appended are exactly
+                invertible.
+
+        Raises:
+            ValueError: If size is smaller than one
+        """
+        if size < 1:
+            raise ValueError(f"size must be at least 1, got {size}")
+        self.size = size
+        self._start = start
+        self._invertible = True if invertible is None else invertible
+        self._checked = invertible is None
+        # The ring buffer and its total, or the back stack and its total.
+        self._values = []
+        self._next = 0
+        self._total = _NO_START
+        # Front stack of (value, sum of it and newer front values), oldest last.
+        self._front = []
+
+    def __len__(self):
+        return len(self._front) + len(self._values)
+
+    def append(self, value):
+        """Append a value, evicting the oldest one if the window is full.
+
+        Args:
+            value: Object to add to the window
+
+        Raises:
+            TypeError: If the value cannot be summed with the window
+        """
+        if self._invertible and self._checked and not _is_exactly_invertible(value):
+            self._leave_ring_buffer()
+        if self._invertible:
+            self._append_invertible(value)
+        else:
+            self._append_two_stacks(value)
+
+    def _leave_ring_buffer(self):
+        # Move the ring buffer, oldest value first, onto the front stack of the
+        # two-stack form, which never subtracts.
+        values = self._values[self._next :] + self._values[: self._next]
+        suffix = _NO_START
+        for item in reversed(values):
+            suffix = _combine(item, suffix)
+            self._front.append((item, suffix))
+        self._values = []
+        self._next = 0
+        self._total = _NO_START
+        self._invertible = False
+
+    def _append_invertible(self, value):
+        if len(self._values) < self.size:
+            self._values.append(value)
+            self._total = _combine(self._total, value)
+        else:
+            evicted = self._values[self._next]
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.size
+            self._total = sum_objects(self._total - evicted, value)
+
+    def _append_two_stacks(self, value):
+        self._values.append(value)
+        self._total = _combine(self._total, value)
+        if len(self) > self.size:
+            if not self._front:
+                suffix = _NO_START
+                for item in reversed(self._values):
+                    suffix = _combine(item, suffix)
+                    self._front.append((item, suffix))
+                self._values.clear()
+                self._total = _NO_START
+            self._front.pop()
+
+    def result(self):
+        """Return the sum of the start value and the values in the window.
+
+        Raises:
+            TypeError: If the window is empty and no start value was given
+        """
+        total = self._total
+        if self._front:
+            total = _combine(self._front[-1][1], total)
+        total = _combine(self._start, total)
+        if total is _NO_START:
+            raise TypeError("result() of empty window with no start value")
+        return total
+
+
+class RangeSumTree:
+    """Segment tree over a growable sequence answering range sums.
+
+    Point updates, appends and queries of the sum over ``[i, j)`` take
+    O(log n) ``sum_objects`` calls. Partial sums are always combined from left
+    to right, so non-commutative types such as ``str`` are supported.
+    """
+
+    __slots__ = ("_length", "_capacity", "_tree")
+
+    def __init__(self, values=()):
+        """Build the tree.
+
+        Args:
+            values: Initial sequence of objects
+        """
+        values = list(values)
+        self._length = len(values)
+        self._capacity = 1
+        while self._capacity < self._length:
+            self._capacity *= 2
+        self._rebuild(values)
+
+    def _rebuild(self, values):
+        capacity = self._capacity
+        self._tree = [_NO_START] * capacity + values
+        self._tree += [_NO_START] * (2 * capacity - len(self._tree))
+        for node in range(capacity - 1, 0, -1):
+            self._tree[node] = _combine(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        return self._tree[self._capacity + self._check_index(index)]
+
+    def _check_index(self, index):
+        if not 0 <= index < self._length:
+            raise IndexError("RangeSumTree index out of range")
+        return index
+
+    def append(self, value):
+        """Append a value to the end of the sequence.
+
+        Args:
+            value: Object to append
+
+        Raises:
+            TypeError: If the value cannot be summed with its neighbours
+        """
+        if self._length == self._capacity:
+            values = self._tree[self._capacity : self._capacity + self._length]
+            self._capacity *= 2
+            self._rebuild(values)
+        self._length += 1
+        self[self._length - 1] = value
+
+    def __setitem__(self, index, value):
+        node = self._capacity + self._check_index(index)
+        self._tree[node] = value
+        while node > 1:
+            node //= 2
+            self._tree[node] = _combine(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def query(self, start, stop, initial=_NO_START):
+        """Return the sum of the values at indexes ``start`` to ``stop - 1``.
+
+        Args:
+            start: First index of the range
+            stop: Index after the end of the range
+            initial: Value added in front of the range sum
+
+        Returns:
+            The sum of initial and the values in the range
+
+        Raises:
+            IndexError: If the range is out of bounds
+            TypeError: If the range is empty and no initial value was given
+        """
+        if not 0 <= start <= stop <= self._length:
+            raise IndexError("RangeSumTree range out of bounds")
+        left_total = right_total = _NO_START
+        left = start + self._capacity
+        right = stop + self._capacity
+        while left < right:
+            if left & 1:
+                left_total = _combine(left_total, self._tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                right_total = _combine(self._tree[right], right_total)
+            left //= 2
+            right //= 2
+        total = _combine(initial, _combine(left_total, right_total))
+        if total is _NO_START:
+            raise TypeError("query() of empty range with no initial value")
+        return total
+
+
+def _byte_view(buffer):
+    view = memoryview(buffer)
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    return view.cast("B")
+
+
+def gather_buffers(buffers):
+    """Return flat byte views of buffers without copying them.
+
+    The result can be passed to ``os.writev`` or ``socket.sendmsg`` to write
+    the concatenation of the buffers without building it first.
+
+    Args:
+        buffers: Iterable of objects supporting the buffer protocol
+
+    Returns:
+        A list of unsigned byte memoryviews of the non-empty buffers
+
+    Raises:
+        TypeError: If an object does not support the buffer protocol
+    """
+    return [view for view in map(_byte_view, buffers) if view.nbytes]
+
+
+def concat_buffers(buffers, out=None):
+    """Concatenate buffers with a single copy of each byte.
+
+    The total size is computed first, so the output is allocated once and
+    filled by slice assignment instead of growing through repeated ``+``.
+
+    Args:
+        buffers: Iterable of objects supporting the buffer protocol
+        out: Optional writable buffer to fill from the start
+
+    Returns:
+        A new bytearray with the concatenation, or the number of bytes
+        written if ``out`` is given
+
+    Raises:
+        TypeError: If an object does not support the buffer protocol, or if
+            ``out`` is not writable
+        ValueError: If ``out`` is too small
+    """
+    views = gather_buffers(buffers)
+    size = sum(view.nbytes for view in views)
+    if out is None:
+        result = bytearray(size)
+        target = memoryview(result)
+    else:
+        target = _byte_view(out)
+        if target.readonly:
+            raise TypeError("out must be a writable buffer")
+        if target.nbytes < size:
+            raise ValueError(f"out holds {target.nbytes} bytes, {size} are needed")
+
+    position = 0
+    for view in views:
+        target[position : position + view.nbytes] = view
+        position += view.nbytes
+    return result if out is None else size
+
+
+class Rope:
+    """Lazy concatenation of str or list chunks.
+
+    Adding to a rope appends a chunk in amortized constant time, so building a
+    long string or list piece by piece is linear instead of quadratic. Length,
+    indexing, slicing, iteration, ``in``, ``startswith``/``endswith`` and
+    equality work on the chunks directly, and ``materialize`` builds the
+    concatenation once.
+
+    Ropes built from one another share their chunk storage, and list chunks are
+    not copied, so they must not be mutated after being added.
+    """
+
+    __slots__ = ("_kind", "_chunks", "_ends", "_count", "_value")
+
+    def __init__(self, value=""):
+        """Create a rope holding a single chunk.
+
+        Args:
+            value: Initial str or list
+        """
+        if isinstance(value, Rope):
+            value = value.materialize()
+        self._kind = str if isinstance(value, str) else list
+        if not isinstance(value, self._kind):
+            raise TypeError(
+                f"Rope chunks must be str or list, not {type(value).__name__}"
+            )
+        self._chunks = [value] if value else []
+        self._ends = [len(value)] if value else []
+        self._count = len(self._chunks)
+        self._value = value
+
+    def __add__(self, other):
+        if isinstance(other, Rope):
+            if other._kind is not self._kind:
+                return NotImplemented
+            chunks = other._chunks[: other._count]
+        elif isinstance(other, self._kind):
+            chunks = [other] if other else []
+        else:
+            return NotImplemented
+
+        rope = object.__new__(Rope)
+        rope._kind = self._kind
+        if len(self._chunks) == self._count:
+            # Nothing was appended to this rope's storage yet, so share it.
+            rope._chunks, rope._ends = self._chunks, self._ends
+        else:
+            rope._chunks = self._chunks[: self._count]
+            rope._ends = self._ends[: self._count]
+        length = len(self)
+        for chunk in chunks:
+            length += len(chunk)
+            rope._chunks.append(chunk)
+            rope._ends.append(length)
+        rope._count = len(rope._chunks)
+        rope._value = None if chunks else self._value
+        return rope
+
+    def __radd__(self, other):
+        if not isinstance(other, self._kind):
+            return NotImplemented
+        return Rope(other) + self
+
+    def __len__(self):
+        return self._ends[self._count - 1] if self._count else 0
+
+    def materialize(self):
+        """Return the concatenation of all chunks as a str or list."""
+        if self._value is None:
+            chunks = self._chunks[: self._count]
+            if self._kind is str:
+                self._value = "".join(chunks)
+            else:
+                self._value = list(chain.from_iterable(chunks))
+            # Later accesses use the single materialized chunk.
+            self._chunks, self._ends = [self._value], [len(self._value)]
+            self._count = 1 if self._value else 0
+        return self._value
+
+    def __str__(self):
+        return str(self.materialize())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.materialize()!r})"
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks[: self._count])
+
+    def _slice(self, start, stop):
+        # Concatenate the parts of the chunks that overlap [start, stop).
+        first = bisect_right(self._ends, start, 0, self._count)
+        parts = []
+        offset = self._ends[first - 1] if first else 0
+        for index in range(first, self._count):
+            if offset >= stop:
+                break
+            chunk = self._chunks[index]
+            parts.append(chunk[max(start - offset, 0) : stop - offset])
+            offset = self._ends[index]
+        if self._kind is str:
+            return "".join(parts)
+        return list(chain.from_iterable(parts))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self._slice(start, max(start, stop))
+            indexes = range(start, stop, step)
+            if not indexes:
+                return self._kind()
+            low = min(indexes[0], indexes[-1])
+            part = self._slice(low, max(indexes[0], indexes[-1]) + 1)
+            items = [part[index - low] for index in indexes]
+            return "".join(items) if self._kind is str else items
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("Rope index out of range")
+        chunk_index = bisect_right(self._ends, index, 0, self._count)
+        offset = self._ends[chunk_index - 1] if chunk_index else 0
+        return self._chunks[chunk_index][index - offset]
+
+    def __contains__(self, item):
+        if self._kind is not str:
+            return any(item in self._chunks[index] for index in range(self._count))
+        if not isinstance(item, str):
+            raise TypeError(
+                f"'in <Rope>' requires str as left operand, not {type(item).__name__}"
+            )
+        # Search each chunk, and the text around each chunk boundary for
+        # matches that span several chunks.
+        overlap = len(item) - 1
+        tail = ""
+        for index in range(self._count):
+            chunk = self._chunks[index]
+            if item in chunk or (tail and item in tail + chunk[:overlap]):
+                return True
+            if overlap:
+                tail = (tail + chunk[-overlap:])[-overlap:]
+        return not item
+
+    def startswith(self, prefix):
+        """Return whether the rope starts with the given str or list, or with
+        any of a tuple of them."""
+        if isinstance(prefix, tuple):
+            return any(map(self.startswith, prefix))
+        return len(prefix) <= len(self) and self._slice(0, len(prefix)) == prefix
+
+    def endswith(self, suffix):
+        """Return whether the rope ends with the given str or list, or with
+        any of a tuple of them."""
+        if isinstance(suffix, tuple):
+            return any(map(self.endswith, suffix))
+        length = len(self)
+        return (
+            len(suffix) <= length
+            and self._slice(length - len(suffix), length) == suffix
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, Rope):
+            other = other.materialize()
+        if not isinstance(other, self._kind):
+            return NotImplemented
+        if len(other) != len(self):
+            return False
+        offset = 0
+        for index in range(self._count):
+            chunk = self._chunks[index]
+            if chunk != other[offset : offset + len(chunk)]:
+                return False
+            offset += len(chunk)
+        return True
+
+    __hash__ = None
+
+
+# Bytes of each input processed per step by sum_files.
+DEFAULT_FILE_CHUNK_BYTES = 1 << 24
+
+
+def _require_numpy(feature):
+    np = _optional_numpy()
+    if np is None:
+        raise ImportError(f"{feature} requires numpy to be installed")
+    return np
+
+
+def _read_column_header(np, path, dtype):
+    # Return (dtype, shape, fortran_order, data offset) of an .npy or raw file.
+    with open(path, "rb") as file:
+        if str(path).endswith(".npy"):
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(file)
+            else:
+                header = np.lib.format.read_array_header_2_0(file)
+            shape, fortran_order, file_dtype = header
+            return file_dtype, shape, fortran_order, file.tell()
+        if dtype is None:
+            raise ValueError(f"dtype is required for raw binary file {path}")
+        dtype = np.dtype(dtype)
+        size = os.fstat(file.fileno()).st_size
+        if size % dtype.itemsize:
+            raise ValueError(f"size of {path} is not a multiple of {dtype}")
+        return dtype, (size // dtype.itemsize,), False, 0
+
+
+def _map_file(path, offset, nbytes, writable):
+    with open(path, "r+b" if writable else "rb") as file:
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        return mmap.mmap(file.fileno(), offset + nbytes, access=access)
+
+
+def _release_pages(mapped, start, stop, flush=False):
+    # Drop the fully processed pages of [start, stop) from memory, so that
+    # the resident size stays bounded by the chunk size.
+    start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+    stop = stop // mmap.PAGESIZE * mmap.PAGESIZE
+    if stop <= start:
+        return
+    if flush:
+        mapped.flush(start, stop - start)
+    if hasattr(mapped, "madvise"):
+        mapped.madvise(mmap.MADV_DONTNEED, start, stop - start)
+
+
+def _chunk_bounds(count, itemsize, offset, chunk_bytes):
+    # Element indexes where the chunks start, followed by the count. Chunks
+    # are whole pages long, and start on page boundaries of a file whose data
+    # start at offset if the elements line up with the pages at all.
+    step_bytes = math.lcm(mmap.PAGESIZE, itemsize)
+    step = step_bytes * max(chunk_bytes // step_bytes, 1) // itemsize
+    gap = -offset % mmap.PAGESIZE
+    first = gap // itemsize if gap % itemsize == 0 else 0
+    starts = range(first, count, step) if first else range(step, count, step)
+    return [0, *starts, count]
+
+
+def sum_files(
+    path_a,
+    path_b,
+    out_path,
+    dtype=None,
+    chunk_bytes=DEFAULT_FILE_CHUNK_BYTES,
+    workers=1,
+):
+    """Sum two numeric files elementwise without loading them into memory.
+
+    Both inputs are memory-mapped and added chunk by chunk into a memory-mapped
+    output file, releasing processed pages as it goes. Files ending in
+    ``.npy`` are read and written in numpy's format, all others as raw arrays
+    of ``dtype``. Requires numpy.
+
+    Args:
+        path_a: Path of the first input file
+        path_b: Path of the second input file
+        out_path: Path of the output file, overwritten if it exists
+        dtype: Element type of raw binary inputs
+        chunk_bytes: Bytes of each input processed per step, rounded down
+            to whole pages. Chunks start on page boundaries of the output.
+        workers: Number of threads summing disjoint ranges of chunks
+
+    Returns:
+        The number of elements written
+
+    Raises:
+        ImportError: If numpy is not installed
+        ValueError: If workers is smaller than one, the output is one of the
+            inputs, or the inputs have different dtypes or shapes
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if os.path.exists(out_path) and any(
+        os.path.samefile(out_path, path) for path in (path_a, path_b)
+    ):
+        raise ValueError(f"output {out_path} is also an input")
+    np = _require_numpy("sum_files")
+    dtype_a, shape, fortran_order, offset_a = _read_column_header(np, path_a, dtype)
+    dtype_b, shape_b, fortran_order_b, offset_b = _read_column_header(np, path_b, dtype)
+    if dtype_a != dtype_b:
+        raise ValueError(f"dtypes differ: {dtype_a} and {dtype_b}")
+    if shape != shape_b or fortran_order != fortran_order_b:
+        raise ValueError(f"shapes differ: {shape} and {shape_b}")
+
+    count = math.prod(shape)
+    nbytes = count * dtype_a.itemsize
+    with open(out_path, "wb") as file:
+        if str(out_path).endswith(".npy"):
+            header = {"descr": np.lib.format.dtype_to_descr(dtype_a)}
+            header.update(fortran_order=fortran_order, shape=shape)
+            np.lib.format.write_array_header_2_0(file, header)
+        offset_out = file.tell()
+        file.truncate(offset_out + nbytes)
+    if not count:
+        return 0
+
+    mapped_a = _map_file(path_a, offset_a, nbytes, writable=False)
+    mapped_b = _map_file(path_b, offset_b, nbytes, writable=False)
+    mapped_out = _map_file(out_path, offset_out, nbytes, writable=True)
+    # The arrays are kept in a list so they can be dropped before the maps are
+    # closed, which fails while numpy still holds their buffers.
+    columns = [
+        np.frombuffer(mapped_a, dtype_a, count, offset_a),
+        np.frombuffer(mapped_b, dtype_a, count, offset_b),
+        np.frombuffer(mapped_out, dtype_a, count, offset_out),
+    ]
+    maps = [(mapped_a, offset_a), (mapped_b, offset_b), (mapped_out, offset_out)]
+    itemsize = dtype_a.itemsize
+    bounds = _chunk_bounds(count, itemsize, offset_out, chunk_bytes)
+    chunks = list(zip(bounds[:-1], bounds[1:]))
+
+    def sum_chunks(chunks):
+        column_a, column_b, column_out = columns
+        for chunk_start, chunk_stop in chunks:
+            np.add(
+                column_a[chunk_start:chunk_stop],
+                column_b[chunk_start:chunk_stop],
+                out=column_out[chunk_start:chunk_stop],
+            )
+            for mapped, offset in maps:
+                _release_pages(
+                    mapped,
+                    offset + chunk_start * itemsize,
+                    offset + chunk_stop * itemsize,
+                    flush=mapped is mapped_out,
+                )
+
+    try:
+        shares = [len(chunks) * worker // workers for worker in range(workers + 1)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(sum_chunks, chunks[start:stop])
+                for start, stop in zip(shares[:-1], shares[1:])
+            ]
+            for future in futures:
+                future.result()
+        mapped_out.flush()
+    finally:
+        columns.clear()
+        for mapped, _ in maps:
+            mapped.close()
+    return count
+
+
+def _add_function():
+    # Plain + gives the same result as sum_objects unless handlers are
+    # registered, but skips the statistics while sum_objects is instrumented.
+    if _registry or sum_objects is not _plain_sum_objects:
+        return sum_objects
+    return operator.add
+
+
+def _accumulate_by_key(totals, records):
+    add = _add_function()
+    get = totals.get
+    for key, value in records:
+        total = get(key, _NO_START)
+        totals[key] = value if total is _NO_START else add(total, value)
+    return totals
+
+
+def sum_by_key(records):
+    """Sum the values of ``(key, value)`` records per key.
+
+    Values are accumulated in place in a single dict while the records are
+    consumed, so any iterable or generator of records can be used.
+
+    Args:
+        records: Iterable of ``(key, value)`` pairs
+
+    Returns:
+        A dict mapping each key, in order of first appearance, to the sum of
+        its values in record order
+
+    Raises:
+        TypeError: If the values of a key cannot be summed
+    """
+    return _accumulate_by_key({}, records)
+
+
+def merge_sum(*mappings):
+    """Merge mappings, summing the values of keys present in several of them.
+
+    Args:
+        *mappings: Mappings from keys to values
+
+    Returns:
+        A new dict with the keys of all mappings, where values of the same key
+        are summed in argument order
+
+    Raises:
+        TypeError: If the values of a key cannot be summed
+    """
+    totals = {}
+    for mapping in mappings:
+        _accumulate_by_key(totals, mapping.items())
+    return totals
+
+
+def iter_sum_by_key(records, max_keys, partitions=16, spill_dir=None):
+    """Sum ``(key, value)`` records per key while holding at most max_keys keys.
+
+    Whenever more than ``max_keys`` keys are held, the partial sums are
+    appended to temporary partition files chosen by the hash of the key. The
+    partitions are then reduced one at a time, so each of them must fit in
+    memory.
+
+    Args:
+        records: Iterable of ``(key, value)`` pairs
+        max_keys: Number of keys to hold in memory before spilling
+        partitions: Number of temporary partition files
+        spill_dir: Directory for the temporary files. Defaults to the system
+            temporary directory.
+
+    Yields:
+        ``(key, total)`` pairs. Without spilling they are in order of first
+        appearance, otherwise grouped by partition.
+
+    Raises:
+        TypeError: If the values of a key cannot be summed
+        ValueError: If max_keys or partitions is smaller than one
+    """
+    if max_keys < 1 or partitions < 1:
+        raise ValueError("max_keys and partitions must be at least 1")
+    add = _add_function()
+    totals = {}
+    files = None
+    try:
+        for key, value in records:
+            total = totals.get(key, _NO_START)
+            if total is not _NO_START:
+                totals[key] = add(total, value)
+                continue
+            if len(totals) >= max_keys:
+                if files is None:
+                    files = [
+                        tempfile.TemporaryFile(dir=spill_dir) for _ in range(partitions)
+                    ]
+                _spill(totals, files)
+            totals[key] = value
+
+        if files is None:
+            yield from totals.items()
+            return
+        _spill(totals, files)
+        for file in files:
+            file.seek(0)
+            partition = {}
+            while True:
+                try:
+                    _accumulate_by_key(partition, pickle.load(file))
+                except EOFError:
+                    break
+            yield from partition.items()
+    finally:
+        for file in files or ():
+            file.close()
+
+
+def _spill(totals, files):
+    # Append the partial sums to the partition files and forget them.
+    buckets = [[] for _ in files]
+    for item in totals.items():
+        buckets[hash(item[0]) % len(files)].append(item)
+    for file, bucket in zip(files, buckets):
+        if bucket:
+            pickle.dump(bucket, file, pickle.HIGHEST_PROTOCOL)
+    totals.clear()
+
+
+def sum_fractions(values, start=0):
+    """Sum rationals exactly, normalizing far less often than pairwise ``+``.
+
+    Numerators are first summed per distinct denominator with plain integer
+    arithmetic. The resulting fractions are then added in a balanced tree, so
+    that the operands of each normalizing addition have similar sizes. Rational
+    sums are exact, so the result equals that of pairwise ``+``.
+
+    Args:
+        values: Iterable of ``Fraction`` or ``int`` values
+        start: Initial value of the sum
+
+    Returns:
+        The sum of start and all values, as a ``Fraction`` unless there are no
+        values
+
+    Raises:
+        AttributeError: If a value has no numerator or denominator
+    """
+    numerators = {}
+    for value in values:
+        denominator = value.denominator
+        numerators[denominator] = numerators.get(denominator, 0) + value.numerator
+    if not numerators:
+        return start
+    partials = [
+        Fraction(numerator, denominator)
+        for denominator, numerator in numerators.items()
+    ]
+    return sum_objects(start, _tree_reduce(partials))
+
+
+def sum_decimals(values, start=decimal.Decimal(0), context=None):
+    """Sum decimals exactly and round the result once.
+
+    The additions run in a context with maximal precision, so no intermediate
+    result is rounded, and the total is then rounded to the given context. The
+    result equals that of pairwise ``+`` whenever pairwise addition would not
+    round either (for example, fixed-point amounts), and is closer to the exact
+    sum otherwise.
+
+    Args:
+        values: Iterable of ``Decimal`` or ``int`` values
+        start: Initial value of the sum
+        context: Context of the result. Defaults to the current context.
+
+    Returns:
+        The rounded sum of start and all values
+
+    Raises:
+        decimal.InvalidOperation: If the sum is undefined, such as inf - inf
+    """
+    if context is None:
+        context = decimal.getcontext()
+    exact = decimal.Context(
+        prec=decimal.MAX_PREC,
+        Emax=decimal.MAX_EMAX,
+        Emin=decimal.MIN_EMIN,
+        traps=[decimal.InvalidOperation],
+    )
+    with decimal.localcontext(exact):
+        total = sum(values, start)
+    return context.plus(total)
+
+
+_NESTED_SEQUENCE_TYPES = {list, tuple}
+
+
+def _flatten_shaped(obj):
+    # Return the shape of a regular nested list and its leaves in row-major
+    # order, flattening one level at a time.
+    shape = []
+    level = [obj]
+    while type(level[0]) in _NESTED_SEQUENCE_TYPES:
+        if not _NESTED_SEQUENCE_TYPES.issuperset(map(type, level)):
+            raise ValueError("nested lists have inconsistent depths")
+        lengths = set(map(len, level))
+        if len(lengths) != 1:
+            raise ValueError("nested lists have inconsistent lengths")
+        shape.append(lengths.pop())
+        level = list(chain.from_iterable(level))
+        if not level:
+            return tuple(shape), level
+    if not _NESTED_SEQUENCE_TYPES.isdisjoint(map(type, level)):
+        raise ValueError("nested lists have inconsistent depths")
+    return tuple(shape), level
+
+
+def _pack_numbers(leaves):
+    # Pack numeric leaves into a compact typed array, or return None.
+    leaf_types = set(map(type, leaves))
+    try:
+        if leaf_types <= {int}:
+            return array("q", leaves)
+        if leaf_types <= {int, float}:
+            return array("d", leaves)
+    except OverflowError:
+        pass
+    return None
+
+
+def _nest(flat, shape):
+    for depth in range(len(shape) - 1, 0, -1):
+        size = shape[depth]
+        groups = math.prod(shape[:depth])
+        flat = [flat[index * size : (index + 1) * size] for index in range(groups)]
+    return flat
+
+
+def add_elementwise(a, b, out=None, as_array=False):
+    """Sum two equally shaped nested lists element by element.
+
+    Unlike ``sum_objects``, which concatenates lists, this adds the leaves at
+    matching positions. Shapes are checked once up front, then the leaves are
+    flattened level by level and added in a single pass. Results with int or
+    float leaves can be packed into a compact ``array.array``.
+
+    Args:
+        a: First nested list (or tuple) of leaves
+        b: Second nested list of leaves with the same shape
+        out: Optional nested list of the same shape, or flat ``array.array``,
+            to store the results in
+        as_array: Whether to return a compact ``array.array`` backed
+            memoryview with the shape of the inputs instead of nested lists.
+            Requires int or float leaves.
+
+    Returns:
+        The elementwise sums as nested lists, a shaped memoryview if
+        ``as_array`` is true, or ``out`` if given
+
+    Raises:
+        TypeError: If a pair of leaves cannot be summed, or if ``as_array``
+            is requested for other leaves
+        ValueError: If the inputs are ragged or have different shapes
+    """
+    shape, leaves_a = _flatten_shaped(a)
+    shape_b, leaves_b = _flatten_shaped(b)
+    if shape != shape_b:
+        raise ValueError(f"shapes differ: {shape} and {shape_b}")
+    if not shape:
+        return sum_objects(a, b)
+
+    result = list(map(_add_function(), leaves_a, leaves_b))
+    if isinstance(out, array):
+        if len(out) != len(result):
+            raise ValueError(f"out has {len(out)} elements, expected {len(result)}")
+        out[:] = array(out.typecode, result)
+        return out
+    if out is not None:
+        return _fill_nested(out, result, shape)
+    if as_array:
+        packed = _pack_numbers(result)
+        if packed is None:
+            raise TypeError("as_array requires int or float leaves")
+        if not all(shape):
+            return memoryview(packed)
+        return memoryview(packed).cast("B").cast(packed.typecode, shape)
+    return _nest(result, shape)
+
+
+def _fill_nested(out, flat, shape):
+    out_shape, _ = _flatten_shaped(out)
+    if out_shape != shape:
+        raise ValueError(f"out has shape {out_shape}, expected {shape}")
+    rows = [out]
+    for _ in shape[:-1]:
+        rows = list(chain.from_iterable(rows))
+    size = shape[-1]
+    for index, row in enumerate(rows):
+        row[:] = flat[index * size : (index + 1) * size]
+    return out
+
+
+# Values an AsyncAccumulator collects before reducing them with sum_many.
+DEFAULT_ASYNC_BATCH_SIZE = 1024
+
+# Longest time in seconds a batch may be reduced on the event loop before
+# batches of that size are reduced in an executor instead.
+DEFAULT_ASYNC_BUDGET = 0.005
+
+
+def _timed_partial_sum(values):
+    # The batch is reduced with sum_many by Accumulator.add_many, which stops
+    # tracking min/max instead of raising if the values cannot be ordered.
+    started = time.perf_counter()
+    partial = Accumulator().add_many(values)
+    return partial, time.perf_counter() - started
+
+
+class AsyncAccumulator:
+    """Accumulator that reduces values as an asyncio producer yields them.
+
+    Values are collected into batches that are reduced with ``sum_many``.
+    The time per value of each batch reduced on the event loop is measured,
+    and batches expected to take longer than the budget are reduced in an
+    executor instead, so that other coroutines keep running. Values are only
+    pulled from a producer after the previous batch is reduced, which gives
+    bounded producers such as an ``asyncio.Queue`` with a ``maxsize``
+    backpressure.
+
+    Other coroutines can read the running total, count, min and max of the
+    values reduced so far at any time. If a reduction is cancelled, its batch
+    stays pending and is reduced by the next flush.
+    """
+
+    def __init__(
+        self,
+        start=_NO_START,
+        batch_size=DEFAULT_ASYNC_BATCH_SIZE,
+        budget=DEFAULT_ASYNC_BUDGET,
+        executor=None,
+    ):
+        """Create an accumulator.
+
+        Args:
+            start: Initial value of the sum. Defaults to the first value added.
+            batch_size: Number of values reduced at a time
+            budget: Longest time in seconds to block the event loop per batch
+            executor: ``concurrent.futures`` executor for large batches.
+                Defaults to the event loop's default executor.
+
+        Raises:
+            ValueError: If batch_size is smaller than one
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self._accumulator = Accumulator(start)
+        self._pending = []
+        # Importing asyncio takes longer than importing the rest of this
+        # module, so only do it here.
+        import asyncio
+
+        self._lock = asyncio.Lock()
+        self._seconds_per_value = 0.0
+        self.batch_size = batch_size
+        self.budget = budget
+        self.executor = executor
+
+    @property
+    def count(self):
+        """Number of values reduced so far."""
+        return self._accumulator.count
+
+    @property
+    def min(self):
+        """Smallest value reduced so far, or None if there is none or the
+        values cannot be ordered."""
+        return self._accumulator.min
+
+    @property
+    def max(self):
+        """Largest value reduced so far, or None if there is none or the
+        values cannot be ordered."""
+        return self._accumulator.max
+
+    @property
+    def pending(self):
+        """Number of values added but not reduced yet."""
+        return len(self._pending)
+
+    def running_total(self, default=None):
+        """Return the sum of the values reduced so far without waiting.
+
+        Args:
+            default: Value returned if nothing was reduced and no start value
+                was given
+
+        Returns:
+            The running total
+        """
+        if self._accumulator._total is _NO_START:
+            return default
+        return self._accumulator._total
+
+    async def add(self, value):
+        """Add one value, reducing the batch once it is full.
+
+        Args:
+            value: Object to add
+
+        Returns:
+            The accumulator itself
+
+        Raises:
+            TypeError: If the values cannot be summed
+        """
+        self._pending.append(value)
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        return self
+
+    async def consume(self, aiterable):
+        """Add all values of an async iterable as they arrive.
+
+        Args:
+            aiterable: Async iterable of objects to add
+
+        Returns:
+            The accumulator itself
+
+        Raises:
+            TypeError: If the values cannot be summed
+        """
+        async for value in aiterable:
+            await self.add(value)
+        await self.flush()
+        return self
+
+    async def flush(self):
+        """Reduce all pending values into the running total.
+
+        Raises:
+            TypeError: If the values cannot be summed
+        """
+        import asyncio
+
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[: self.batch_size]
+                if len(batch) * self._seconds_per_value > self.budget:
+                    loop = asyncio.get_running_loop()
+                    partial, elapsed = await loop.run_in_executor(
+                        self.executor, _timed_partial_sum, batch
+                    )
+                else:
+                    partial, elapsed = _timed_partial_sum(batch)
+                self._seconds_per_value = elapsed / len(batch)
+                self._accumulator.merge(partial)
+                del self._pending[: len(batch)]
+                # Let other coroutines run between batches.
+                await asyncio.sleep(0)
+
+    async def result(self):
+        """Reduce the pending values and return the sum of all values.
+
+        Raises:
+            TypeError: If the values cannot be summed, or if no values were
+                added and no start value was given
+        """
+        await self.flush()
+        return self._accumulator.result()
+
+
+async def sum_async(
+    aiterable,
+    start=_NO_START,
+    batch_size=DEFAULT_ASYNC_BATCH_SIZE,
+    budget=DEFAULT_ASYNC_BUDGET,
+    executor=None,
+):
+    """Sum the values of an async iterable as they arrive.
+
+    See ``AsyncAccumulator`` for how batches are reduced without blocking
+    the event loop.
+
+    Args:
+        aiterable: Async iterable of objects to sum
+        start: Initial value of the sum. Defaults to the first item.
+        batch_size: Number of values reduced at a time
+        budget: Longest time in seconds to block the event loop per batch
+        executor: ``concurrent.futures`` executor for large batches.
+            Defaults to the event loop's default executor.
+
+    Returns:
+        The sum of start and all items
+
+    Raises:
+        TypeError: If the objects cannot be summed, or if the iterable is
+            empty and no start value was given
+        ValueError: If batch_size is smaller than one
+    """
+    accumulator = AsyncAccumulator(start, batch_size, budget, executor)
+    await accumulator.consume(aiterable)
+    if accumulator.running_total(_NO_START) is _NO_START:
+        raise TypeError("sum_async() of empty iterable with no start value")
+    return await accumulator.result()
+
+
+# Additive identities of immutable types, with the operand types they can be
+# added to without changing them: x + 0 is x for ints and fractions, but not
+# -0.0 for floats.
+_IDENTITY_SHORTCUTS = {
+    int: (0, (int, Fraction)),
+    str: ("", (str,)),
+    bytes: (b"", (bytes,)),
+    tuple: ((), (tuple,)),
+}
+
+
+def _identity_shortcut(a, b):
+    # Return the sum of a and b if one of them is an additive identity that
+    # leaves the other unchanged, or _NO_START otherwise.
+    shortcut = _IDENTITY_SHORTCUTS.get(type(b))
+    if shortcut is not None and type(a) in shortcut[1] and b == shortcut[0]:
+        return a
+    shortcut = _IDENTITY_SHORTCUTS.get(type(a))
+    if shortcut is not None and type(b) in shortcut[1] and a == shortcut[0]:
+        return b
+    return _NO_START
+
+
+def _cache_key(value):
+    # Key of an operand that only equals the key of an operand with the same
+    # sums: equal values of different types (1 and 1.0, also nested in
+    # tuples) and zeros of different signs get different keys. Decimal sums
+    # depend on the current context, so they are not cached.
+    value_type = type(value)
+    if value_type is float:
+        return value_type, value, math.copysign(1.0, value)
+    if value_type is complex:
+        signs = math.copysign(1.0, value.real), math.copysign(1.0, value.imag)
+        return value_type, value, signs
+    if value_type in (tuple, frozenset):
+        return value_type, value_type(map(_cache_key, value))
+    if value_type is decimal.Decimal:
+        raise TypeError("Decimal sums depend on the context")
+    return value_type, value
+
+
+class CachedSum:
+    """Memoizing wrapper around ``sum_objects`` for expensive operands.
+
+    Results are cached by the pair of operands (or of the keys a key function
+    gives for them) and evicted least recently used first once the cache
+    holds more than ``maxsize`` entries or, if given, more than ``max_bytes``
+    as estimated by ``sys.getsizeof`` of the results. Entries older than
+    ``ttl`` seconds are discarded on lookup. Unhashable operands, and those
+    the key function raises ``TypeError`` for, are summed without the cache,
+    and sums with an additive identity such as ``x + 0`` or ``"" + s`` are
+    returned without calling ``+``.
+
+    Cached results are shared between calls, so they should not be mutated.
+    The cache is thread-safe. Sums are computed outside of the lock, so two
+    threads may compute the same sum at the same time.
+    """
+
+    def __init__(
+        self, maxsize=1024, ttl=None, max_bytes=None, key=None, timer=time.monotonic
+    ):
+        """Create an empty cache.
+
+        Args:
+            maxsize: Maximum number of cached sums
+            ttl: Seconds after which a cached sum expires. Defaults to never.
+            max_bytes: Maximum estimated size of all cached sums in bytes.
+                Defaults to no limit.
+            key: Function mapping an operand to its cache key. Defaults to
+                the operand with its type and those of its tuple or frozenset
+                elements, and the sign of float zeros, so that ``1`` and
+                ``1.0``, or ``0.0`` and ``-0.0``, differ. Decimals are not
+                cached by default.
+            timer: Function returning the current time in seconds for ttl
+
+        Raises:
+            ValueError: If maxsize is smaller than one
+        """
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._key = key
+        self._timer = timer
+        self._lock = threading.Lock()
+        # Map of key pairs to (sum, expiry time, estimated size), oldest first.
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = dict.fromkeys(
+            ("hits", "misses", "bypassed", "shortcuts", "evictions", "expirations"),
+            0,
+        )
+
+    def _operand_key(self, operand):
+        if self._key is None:
+            return _cache_key(operand)
+        return self._key(operand)
+
+    def __call__(self, a, b):
+        """Sum two objects, using a cached sum if there is one.
+
+        Args:
+            a: First object to sum
+            b: Second object to sum
+
+        Returns:
+            The sum of a and b
+
+        Raises:
+            TypeError: If the objects cannot be summed
+        """
+        if not _registry or _dispatch(type(a), type(b)) is None:
+            total = _identity_shortcut(a, b)
+            if total is not _NO_START:
+                with self._lock:
+                    self._stats["shortcuts"] += 1
+                return total
+
+        try:
+            key = self._operand_key(a), self._operand_key(b)
+            hash(key)
+        except TypeError:
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return sum_objects(a, b)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > self._timer():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[0]
+                self._remove(key)
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+
+        total = sum_objects(a, b)
+        expires = None if self.ttl is None else self._timer() + self.ttl
+        size = sys.getsizeof(total) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = total, expires, size
+            self._bytes += size
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return total
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+    def invalidate(self, a, b=_NO_START):
+        """Discard the cached sum of a pair of operands.
+
+        Args:
+            a: First operand
+            b: Second operand. If not given, all cached sums that a is an
+                operand of are discarded.
+
+        Returns:
+            The number of cached sums discarded
+        """
+        key_a = self._operand_key(a)
+        with self._lock:
+            if b is not _NO_START:
+                key = key_a, self._operand_key(b)
+                if key not in self._entries:
+                    return 0
+                self._remove(key)
+                return 1
+            keys = [key for key in self._entries if key_a in key]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        """Discard all cached sums and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        """Return the cache statistics.
+
+        Returns:
+            A dict with the numbers of hits, misses, bypassed unhashable
+            calls, identity shortcuts, evictions and expirations, and the
+            current number of entries and estimated bytes
+        """
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "bytes": self._bytes}
+
+
+class _Partial:
+    # Partial sum of the values one thread added to a ConcurrentSum.
+    __slots__ = ("total", "generation")
+
+    def __init__(self, generation):
+        self.total = _NO_START
+        self.generation = generation
+
+
+class ConcurrentSum:
+    """Running sum that many threads can add to without contending.
+
+    Each thread adds to its own partial sum, so ``add`` takes no lock once a
+    thread has made its first addition. The partial sums are only combined
+    when the total is read. This scales on free-threaded builds, where a lock
+    around a shared total would serialize all threads.
+
+    The partial sums of different threads are combined in no particular
+    order, so the values must be summed with a commutative addition, such as
+    that of numbers.
+
+    Consistency: ``snapshot`` includes every ``add`` that returned before it
+    was called, and any subset of the additions running concurrently with it.
+    An ``add`` running concurrently with ``reset`` is counted either before
+    the reset, and so discarded, or after it.
+    """
+
+    def __init__(self, start=_NO_START):
+        """Create a sum.
+
+        Args:
+            start: Initial value of the sum, kept on reset. Defaults to the
+                first value added.
+        """
+        self._start = start
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._partials = []
+        self._generation = 0
+
+    def _new_partial(self):
+        with self._lock:
+            partial = _Partial(self._generation)
+            self._partials.append(partial)
+        self._local.partial = partial
+        return partial
+
+    def add(self, value):
+        """Add a value to the sum.
+
+        Args:
+            value: Object to add
+
+        Raises:
+            TypeError: If the value cannot be summed with the values this
+                thread added before
+        """
+        partial = getattr(self._local, "partial", None)
+        if partial is None or partial.generation != self._generation:
+            partial = self._new_partial()
+        total = partial.total
+        partial.total = value if total is _NO_START else sum_objects(total, value)
+
+    def snapshot(self):
+        """Return the sum of the start value and all values added so far.
+
+        Raises:
+            TypeError: If the partial sums cannot be summed, or if no values
+                were added and no start value was given
+        """
+        with self._lock:
+            partials = self._partials[:]
+        total = self._start
+        for partial in partials:
+            total = _combine(total, partial.total)
+        if total is _NO_START:
+            raise TypeError("snapshot() of empty ConcurrentSum with no start value")
+        return total
+
+    def reset(self):
+        """Discard all values added so far, keeping the start value."""
+        with self._lock:
+            self._generation += 1
+            self._partials = []
+
+
+SERIES_ALIGNMENTS = ("outer", "inner")
+
+
+def _series_chunks(series, chunk_size):
+    # Split a (timestamps, values) pair of columns into zero-copy slices.
+    timestamps, values = series
+    if len(timestamps) != len(values):
+        raise ValueError("timestamps and values have different lengths")
+    for index in range(0, len(timestamps), chunk_size):
+        yield timestamps[index : index + chunk_size], values[index : index + chunk_size]
+
+
+def _sorted_points(chunks, name):
+    previous = None
+    for timestamps, values in chunks:
+        if len(timestamps) != len(values):
+            raise ValueError("timestamps and values have different lengths")
+        for point in zip(timestamps, values):
+            if previous is not None and point[0] < previous:
+                raise ValueError(f"timestamps of series {name} are not sorted")
+            previous = point[0]
+            yield point
+
+
+def _merge_points(points_a, points_b, tolerance):
+    # Merge-join two sorted point streams, yielding (timestamp, value_a,
+    # value_b) with _NO_START for a missing value. A point is matched with a
+    # point of the other series within the tolerance unless the next point of
+    # either series is even closer, and matches use the earlier timestamp so
+    # that the output stays sorted.
+    head_a, next_a = next(points_a, None), next(points_a, None)
+    head_b, next_b = next(points_b, None), next(points_b, None)
+    while head_a is not None and head_b is not None:
+        (time_a, value_a), (time_b, value_b) = head_a, head_b
+        gap = abs(time_a - time_b)
+        if (
+            gap <= tolerance
+            and (next_b is None or abs(time_a - next_b[0]) >= gap)
+            and (next_a is None or abs(next_a[0] - time_b) >= gap)
+        ):
+            yield min(time_a, time_b), value_a, value_b
+            head_a, next_a = next_a, next(points_a, None)
+            head_b, next_b = next_b, next(points_b, None)
+        elif time_a <= time_b:
+            yield time_a, value_a, _NO_START
+            head_a, next_a = next_a, next(points_a, None)
+        else:
+            yield time_b, _NO_START, value_b
+            head_b, next_b = next_b, next(points_b, None)
+    while head_a is not None:
+        yield head_a[0], head_a[1], _NO_START
+        head_a, next_a = next_a, next(points_a, None)
+    while head_b is not None:
+        yield head_b[0], _NO_START, head_b[1]
+        head_b, next_b = next_b, next(points_b, None)
+
+
+def _iter_add_series_python(chunks_a, chunks_b, fill, tolerance, how, chunk_size):
+    merged = _merge_points(
+        _sorted_points(chunks_a, "a"), _sorted_points(chunks_b, "b"), tolerance
+    )
+    timestamps, values = [], []
+    for timestamp, value_a, value_b in merged:
+        if value_a is not _NO_START and value_b is not _NO_START:
+            value = sum_objects(value_a, value_b)
+        elif how == "inner":
+            continue
+        elif value_b is _NO_START:
+            value = value_a if fill is _NO_START else sum_objects(value_a, fill)
+        else:
+            value = value_b if fill is _NO_START else sum_objects(fill, value_b)
+        timestamps.append(timestamp)
+        values.append(value)
+        if len(timestamps) >= chunk_size:
+            yield timestamps, values
+            timestamps, values = [], []
+    if timestamps:
+        yield timestamps, values
+
+
+def _occurrences(np, times):
+    # Number of earlier points with the same timestamp, for sorted timestamps.
+    index = np.arange(len(times))
+    starts = np.empty(len(times), bool)
+    starts[:1] = True
+    np.not_equal(times[1:], times[:-1], out=starts[1:])
+    return index - np.maximum.accumulate(np.where(starts, index, 0))
+
+
+def _merge_numpy(np, series_a, series_b, fill, how):
+    (times_a, values_a), (times_b, values_b) = series_a, series_b
+    # A stable sort merges the two sorted runs in linear time, unlike the
+    # hash-based np.union1d, and gives each point its output position.
+    # Duplicate timestamps are told apart by their occurrence, so that they
+    # are matched one to one in order like the Python merge does.
+    times = np.concatenate([times_a, times_b])
+    unique = not (
+        np.any(times_a[1:] == times_a[:-1]) or np.any(times_b[1:] == times_b[:-1])
+    )
+    if unique:
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        new = np.empty(len(times), bool)
+        new[:1] = True
+        np.not_equal(times[1:], times[:-1], out=new[1:])
+    else:
+        occurrences = np.concatenate(
+            [_occurrences(np, times_a), _occurrences(np, times_b)]
+        )
+        order = np.lexsort((occurrences, times))
+        times, occurrences = times[order], occurrences[order]
+        new = np.empty(len(times), bool)
+        new[:1] = True
+        new[1:] = (times[1:] != times[:-1]) | (occurrences[1:] != occurrences[:-1])
+    positions = np.empty(len(times), np.intp)
+    positions[order] = np.cumsum(new) - 1
+    index_a, index_b = positions[: len(times_a)], positions[len(times_a) :]
+    times = times[new]
+
+    dtypes = [values_a.dtype, values_b.dtype]
+    if fill is not _NO_START:
+        dtypes.append(np.min_scalar_type(fill))
+    values = np.zeros(len(times), np.result_type(*dtypes))
+    values[index_a] = values_a
+    values[index_b] += values_b
+    in_a = np.zeros(len(times), bool)
+    in_a[index_a] = True
+    in_b = np.zeros(len(times), bool)
+    in_b[index_b] = True
+    if how == "inner":
+        matched = in_a & in_b
+        return times[matched], values[matched]
+    if fill is not _NO_START:
+        values[in_a ^ in_b] += fill
+    return times, values
+
+
+def _iter_add_series_numpy(np, chunks_a, chunks_b, fill, how):
+    # Merge chunk by chunk, up to the smaller of the last timestamps of the
+    # two current chunks, carrying the rest over to the next step. Points at
+    # that last timestamp are carried over too while more points with the
+    # same timestamp may follow, so that duplicates are merged together.
+    sources = [iter(chunks_a), iter(chunks_b)]
+    carries = [None, None]
+    lasts = [None, None]
+    while True:
+        for side, name in enumerate("ab"):
+            while sources[side] is not None and (
+                carries[side] is None
+                or not len(carries[side][0])
+                or carries[side][0][0] == carries[side][0][-1]
+            ):
+                chunk = next(sources[side], None)
+                if chunk is None:
+                    sources[side] = None
+                    break
+                times, values = map(np.asarray, chunk)
+                if len(times) != len(values):
+                    raise ValueError("timestamps and values have different lengths")
+                if not len(times):
+                    continue
+                if np.any(np.diff(times) < 0) or (
+                    lasts[side] is not None and times[0] < lasts[side]
+                ):
+                    raise ValueError(f"timestamps of series {name} are not sorted")
+                lasts[side] = times[-1]
+                if carries[side] is not None:
+                    times = np.concatenate([carries[side][0], times])
+                    values = np.concatenate([carries[side][1], values])
+                carries[side] = times, values
+        empty = [carry is None or not len(carry[0]) for carry in carries]
+        if all(empty):
+            return
+        if any(empty):
+            side = empty.index(False)
+            times, values = carries[side]
+            carries[side] = None
+            if how == "inner":
+                continue
+            if fill is not _NO_START:
+                values = values + fill
+            yield times, values
+            continue
+        cuts = [
+            carry[0][-1]
+            for carry, source in zip(carries, sources)
+            if source is not None
+        ]
+        heads = []
+        for side in (0, 1):
+            times, values = carries[side]
+            stop = np.searchsorted(times, min(cuts), "left") if cuts else len(times)
+            heads.append((times[:stop], values[:stop]))
+            carries[side] = times[stop:], values[stop:]
+        if len(heads[0][0]) or len(heads[1][0]):
+            yield _merge_numpy(np, heads[0], heads[1], fill, how)
+
+
+def iter_add_series(
+    chunks_a,
+    chunks_b,
+    fill=_NO_START,
+    tolerance=0,
+    how="outer",
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """Add two sorted time series point by point, streaming over chunks.
+
+    Both series are given as iterables of ``(timestamps, values)`` column
+    chunks, such as slices of memory-mapped arrays, and are merge-joined in
+    one pass with memory bounded by the chunk sizes. See ``add_series`` for
+    how points are aligned.
+
+    If the first chunks are numpy arrays, numpy is already imported and the
+    tolerance is zero, chunks are merged with vectorized numpy operations.
+    This requires numeric values.
+
+    Args:
+        chunks_a: Chunks of the first series
+        chunks_b: Chunks of the second series
+        fill: Value added to points that have no match in the other series.
+            Defaults to passing them through unchanged.
+        tolerance: Largest timestamp difference of two matching points
+        how: ``"outer"`` to keep points without a match, or ``"inner"`` to
+            skip them
+        chunk_size: Number of points per output chunk of the Python merge
+
+    Yields:
+        ``(timestamps, values)`` chunks of the summed series, as numpy arrays
+        for the numpy merge and as lists otherwise
+
+    Raises:
+        TypeError: If two values cannot be summed
+        ValueError: If how is unknown, tolerance is negative, a chunk's
+            columns differ in length, or the timestamps are not sorted
+    """
+    if how not in SERIES_ALIGNMENTS:
+        raise ValueError(f"how must be one of {SERIES_ALIGNMENTS}")
+    if tolerance < 0:
+        raise ValueError(f"tolerance must not be negative, got {tolerance}")
+    chunks_a, chunks_b = iter(chunks_a), iter(chunks_b)
+    first_a, first_b = next(chunks_a, None), next(chunks_b, None)
+    np = sys.modules.get("numpy")
+    if (
+        np is not None
+        and tolerance == 0
+        and (first_a, first_b) != (None, None)
+        and all(
+            first is None or isinstance(first[1], np.ndarray)
+            for first in (first_a, first_b)
+        )
+    ):
+        yield from _iter_add_series_numpy(
+            np, chain([first_a], chunks_a), chain([first_b], chunks_b), fill, how
+        )
+        return
+    yield from _iter_add_series_python(
+        chain([first_a] if first_a is not None else [], chunks_a),
+        chain([first_b] if first_b is not None else [], chunks_b),
+        fill,
+        tolerance,
+        how,
+        chunk_size,
+    )
+
+
+def add_series(
+    ts_a, ts_b, fill=_NO_START, tolerance=0, how="outer", chunk_size=DEFAULT_CHUNK_SIZE
+):
+    """Add two sorted time series point by point.
+
+    Points of the two series whose timestamps are within the tolerance of
+    each other are matched one to one, with each point matching the nearest
+    point of the other series available in a single left-to-right pass, and
+    their values are summed with ``sum_objects``. Matched points take the
+    earlier of the two timestamps. Points without a match are kept (outer
+    alignment), optionally summed with a fill value, or skipped (inner
+    alignment).
+
+    The series are merge-joined in one linear pass over chunks of the
+    columns, using numpy for numpy columns with a zero tolerance; see
+    ``iter_add_series``. Use ``iter_add_series`` directly to stream results
+    that do not fit in memory.
+
+    Args:
+        ts_a: First series as a pair of equally long ``(timestamps, values)``
+            columns, such as lists, ``array.array`` or numpy arrays, with
+            the timestamps sorted in ascending order
+        ts_b: Second series in the same form
+        fill: Value added to points that have no match in the other series.
+            Defaults to passing them through unchanged.
+        tolerance: Largest timestamp difference of two matching points
+        how: ``"outer"`` to keep points without a match, or ``"inner"`` to
+            skip them
+        chunk_size: Number of points processed at a time
+
+    Returns:
+        The summed series as a ``(timestamps, values)`` pair of numpy arrays
+        for the numpy merge, and of lists otherwise
+
+    Raises:
+        TypeError: If two values cannot be summed
+        ValueError: If how is unknown, tolerance is negative, the columns of
+            a series differ in length, or the timestamps are not sorted
+    """
+    chunks = list(
+        iter_add_series(
+            _series_chunks(ts_a, chunk_size),
+            _series_chunks(ts_b, chunk_size),
+            fill,
+            tolerance,
+            how,
+            chunk_size,
+        )
+    )
+    np = sys.modules.get("numpy")
+    if np is not None and chunks and isinstance(chunks[0][1], np.ndarray):
+        return (
+            np.concatenate([times for times, _ in chunks]),
+            np.concatenate([values for _, values in chunks]),
+        )
+    return (
+        list(chain.from_iterable(times for times, _ in chunks)),
+        list(chain.from_iterable(values for _, values in chunks)),
+    )
+
+
+# Setting this environment variable to a non-empty value other than "0"
+# instruments sum_objects from import time on.
+INSTRUMENTATION_ENV_VAR = "SUM_OBJECTS_INSTRUMENT"
+
+_SLOW_CALL_SAMPLES = 32
+
+_plain_sum_objects = sum_objects
+_instrumentation_lock = threading.Lock()
+_call_stats = {}
+_slow_calls = deque(maxlen=_SLOW_CALL_SAMPLES)
+_slow_call_ns = 1_000_000
+
+
+class _CallStats:
+    __slots__ = ("calls", "errors", "total_ns", "histogram", "size_total", "size_max")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        # Number of calls per latency bucket, where bucket k holds latencies
+        # below 2**k nanoseconds.
+        self.histogram = [0] * 65
+        self.size_total = 0
+        self.size_max = 0
+
+    def percentile_seconds(self, fraction):
+        rank = fraction * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                return 2**bucket / 1e9
+        return 0.0
+
+
+def _operand_size(a, b):
+    try:
+        return max(len(a), len(b))
+    except TypeError:
+        return 0
+
+
+@wraps(_plain_sum_objects)
+def _instrumented_sum_objects(a, b, *, lazy=False):
+    failed = True
+    started = time.perf_counter_ns()
+    try:
+        result = _plain_sum_objects(a, b, lazy=lazy)
+        failed = False
+        return result
+    finally:
+        elapsed = time.perf_counter_ns() - started
+        key = (type(a).__qualname__, type(b).__qualname__)
+        size = _operand_size(a, b)
+        with _instrumentation_lock:
+            stats = _call_stats.get(key)
+            if stats is None:
+                stats = _call_stats[key] = _CallStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_ns += elapsed
+            stats.histogram[elapsed.bit_length()] += 1
+            stats.size_total += size
+            stats.size_max = max(stats.size_max, size)
+            if elapsed >= _slow_call_ns:
+                _slow_calls.append(
+                    {"types": key, "seconds": elapsed / 1e9, "operand_size": size}
+                )
+
+
+def enable_instrumentation(slow_call_seconds=1e-3):
+    """Replace ``sum_objects`` with a version that records call statistics.
+
+    Only calls that look up ``lib.sum_objects`` at call time are recorded,
+    which includes the pairwise reductions in this module. Bulk fast paths
+    that never add pairs, such as those of ``sum_many`` for homogeneous
+    ``str`` or ``int`` inputs and the numeric sums like ``sum_floats``, are
+    not recorded. Names imported with ``from lib import sum_objects`` keep
+    the function bound at import time.
+
+    Args:
+        slow_call_seconds: Calls taking at least this long are sampled
+    """
+    global sum_objects, _slow_call_ns
+    _slow_call_ns = int(slow_call_seconds * 1e9)
+    sum_objects = _instrumented_sum_objects
+
+
+def disable_instrumentation():
+    """Restore the plain ``sum_objects``, keeping the statistics recorded."""
+    global sum_objects
+    sum_objects = _plain_sum_objects
+
+
+def is_instrumented():
+    """Return whether ``sum_objects`` is currently instrumented."""
+    return sum_objects is _instrumented_sum_objects
+
+
+def reset_instrumentation():
+    """Forget all recorded call statistics."""
+    with _instrumentation_lock:
+        _call_stats.clear()
+        _slow_calls.clear()
+
+
+@contextmanager
+def instrumented(slow_call_seconds=1e-3):
+    """Instrument ``sum_objects`` inside a ``with`` block.
+
+    Args:
+        slow_call_seconds: Calls taking at least this long are sampled
+
+    Yields:
+        A function returning the current statistics snapshot
+    """
+    was_instrumented = is_instrumented()
+    enable_instrumentation(slow_call_seconds)
+    try:
+        yield instrumentation_snapshot
+    finally:
+        if not was_instrumented:
+            disable_instrumentation()
+
+
+def instrumentation_snapshot():
+    """Return the recorded call statistics as a JSON-serializable dict.
+
+    Returns:
+        A dict with a ``"pairs"`` entry mapping ``"TypeA+TypeB"`` to call
+        counts, error rates, latencies in seconds and operand sizes (the
+        larger ``len`` of the operands, 0 if unsized), and a ``"slow_calls"``
+        entry listing the most recent slow calls
+    """
+    with _instrumentation_lock:
+        pairs = {
+            f"{type_a}+{type_b}": {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "error_rate": stats.errors / stats.calls,
+                "total_seconds": stats.total_ns / 1e9,
+                "mean_seconds": stats.total_ns / stats.calls / 1e9,
+                "p50_seconds": stats.percentile_seconds(0.5),
+                "p90_seconds": stats.percentile_seconds(0.9),
+                "p99_seconds": stats.percentile_seconds(0.99),
+                "mean_operand_size": stats.size_total / stats.calls,
+                "max_operand_size": stats.size_max,
+            }
+            for (type_a, type_b), stats in _call_stats.items()
+        }
+        slow_calls = [
+            {**sample, "types": "+".join(sample["types"])} for sample in _slow_calls
+        ]
+    return {"pairs": pairs, "slow_calls": slow_calls}
+
+
+def instrumentation_report():
+    """Return the recorded call statistics as a human-readable table."""
+    snapshot = instrumentation_snapshot()
+    lines = [
+        f"{'types':<24} {'calls':>10} {'errors':>8} {'total s':>10} "
+        f"{'p50 s':>10} {'p99 s':>10} {'max size':>9}"
+    ]
+    pairs = sorted(
+        snapshot["pairs"].items(), key=lambda item: -item[1]["total_seconds"]
+    )
+    for types, stats in pairs:
+        lines.append(
+            f"{types:<24} {stats['calls']:>10} {stats['errors']:>8} "
+            f"{stats['total_seconds']:>10.3g} {stats['p50_seconds']:>10.3g} "
+            f"{stats['p99_seconds']:>10.3g} {stats['max_operand_size']:>9}"
+        )
+    if snapshot["slow_calls"]:
+        lines.append(f"{len(snapshot['slow_calls'])} recent slow calls:")
+        lines.extend(
+            f"  {call['types']}: {call['seconds']:.3g} s, size {call['operand_size']}"
+            for call in snapshot["slow_calls"]
+        )
+    return "\n".join(lines)
+
+
+if os.environ.get(INSTRUMENTATION_ENV_VAR, "0") not in ("", "0"):
+    enable_instrumentation()
@@ -1,6 +1,266 @@
-def main():
-    print("Hello from pytest-minimal-example!")
+import argparse
+import math
+import sys
+import time
+
+import lib
+
+# Bytes read from an input file at a time by the sum subcommand.
+READ_BLOCK_SIZE = 1 << 20
+
+# Partial sums kept per group before they are reduced to one.
+_MAX_GROUP_PARTIALS = 64
+
+
+def add_files(args):
+    """Sum two numeric files elementwise into an output file."""
+    count = lib.sum_files(
+        args.file_a,
+        args.file_b,
+        args.output,
+        dtype=args.dtype,
+        chunk_bytes=args.chunk_bytes,
+        workers=args.workers,
+    )
+    print(f"Wrote {count} elements to {args.output}")
+    return 0
+
+
+def read_blocks(paths, block_size=READ_BLOCK_SIZE, skip_header=False):
+    """Read files in large blocks that each end at a line boundary.
+
+    Args:
+        paths: File paths to read, where ``-`` stands for standard input
+        block_size: Number of bytes to read at a time
+        skip_header: Whether to skip the first line of every file
+
+    Yields:
+        Blocks of whole lines as bytes
+    """
+    for path in paths:
+        file = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            if skip_header:
+                file.readline()
+            rest = b""
+            while block := file.read(block_size):
+                block = rest + block
+                end = block.rfind(b"\n") + 1
+                rest = block[end:]
+                if end:
+                    yield block[:end]
+            if rest:
+                yield rest
+        finally:
+            if file is not sys.stdin.buffer:
+                file.close()
+
+
+def parse_numbers(tokens, args):
+    """Parse number tokens in bulk with the selected type and engine."""
+    if args.engine == "numpy":
+        import numpy
+
+        return numpy.array(tokens, dtype=numpy.float64)
+    return list(map(int if args.type == "int" else float, tokens))
+
+
+def parse_block(block, args):
+    """Parse the numbers, and keys if grouping, of a block of lines.
+
+    Args:
+        block: Bytes holding whole lines
+        args: Parsed command line arguments of the sum subcommand
+
+    Whitespace-separated numbers are split and parsed in bulk. CSV lines are
+    split one at a time, since rows may differ in their number of fields,
+    and the selected column is then parsed in bulk.
+
+    Returns:
+        A pair of the list of keys, or None if not grouping, and the values
+
+    Raises:
+        ValueError: If a number cannot be parsed or a line has too few columns
+    """
+    delimiter = args.delimiter.encode()
+    if args.column is None and args.key_column is None and delimiter not in block:
+        return None, parse_numbers(block.split(), args)
+
+    rows = [line.split(delimiter) for line in block.splitlines() if line.strip()]
+    values = parse_numbers(select_column(rows, args.column or 0), args)
+    if args.key_column is None:
+        return None, values
+    keys = select_column(rows, args.key_column)
+    return [key.strip().decode() for key in keys], values
+
+
+def select_column(rows, column):
+    """Return one column of split CSV lines.
+
+    Raises:
+        ValueError: If a line has too few columns
+    """
+    try:
+        return [row[column] for row in rows]
+    except IndexError:
+        raise ValueError(f"a line has no column {column}") from None
+
+
+def reduce_values(values, args):
+    """Sum a list or array of parsed numbers with the selected precision."""
+    if args.type == "int" and args.engine != "numpy":
+        return lib.sum_many(values, 0)
+    return lib.sum_floats(values, mode=args.mode)
+
+
+def exact_partials(values):
+    """Return a few floats whose exact sum is the exact sum of the values.
+
+    Unlike a single rounded total, these partials can be carried from block
+    to block without losing precision.
+    """
+    values = list(values)
+    partials = []
+    while (total := math.fsum(values)) != 0.0:
+        partials.append(total)
+        if not math.isfinite(total):
+            break
+        values.append(-total)
+    return partials
+
+
+def block_partials(values, args):
+    """Reduce the values of a block to the partial sums carried forward."""
+    exact = args.mode == "exact" or (args.mode is None and args.engine == "python")
+    if args.type == "float" and exact:
+        return exact_partials(values)
+    return [reduce_values(values, args)]
+
+
+def sum_numbers(args):
+    """Sum the numbers in files or standard input, optionally grouped by key."""
+    started = time.perf_counter()
+    rows = 0
+    groups = {}
+    blocks = read_blocks(args.files, READ_BLOCK_SIZE, args.skip_header)
+    for block in blocks:
+        try:
+            keys, values = parse_block(block, args)
+        except ValueError as error:
+            print(f"error: invalid input: {error}", file=sys.stderr)
+            return 1
+        rows += len(values)
+        if keys is None:
+            keys, values = [None], [values]
+        else:
+            grouped = {}
+            for key, value in zip(keys, values):
+                grouped.setdefault(key, []).append(value)
+            keys, values = grouped.keys(), grouped.values()
+        for key, key_values in zip(keys, values):
+            partials = groups.setdefault(key, [])
+            partials.extend(block_partials(key_values, args))
+            if len(partials) >= _MAX_GROUP_PARTIALS:
+                partials[:] = block_partials(partials, args)
+
+    totals = {key: reduce_values(partials, args) for key, partials in groups.items()}
+    if args.key_column is None:
+        print(totals.get(None, 0))
+    else:
+        for key, total in totals.items():
+            print(f"{key}{args.delimiter}{total}")
+
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else float("inf")
+    print(
+        f"Summed {rows} rows in {elapsed:.3f} s ({rate:,.0f} rows/s)", file=sys.stderr
+    )
+    return 0
+
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(
+        prog="pytest-minimal-example",
+        description="Sum objects with the lib module.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    add_files_parser = subparsers.add_parser(
+        "add-files",
+        help="sum two .npy or raw binary files elementwise without loading them",
+    )
+    add_files_parser.add_argument("file_a", help="first input file")
+    add_files_parser.add_argument("file_b", help="second input file")
+    add_files_parser.add_argument("output", help="output file")
+    add_files_parser.add_argument(
+        "--dtype", help="element type of raw binary files, e.g. float64"
+    )
+    add_files_parser.add_argument(
+        "--chunk-bytes",
+        type=int,
+        default=lib.DEFAULT_FILE_CHUNK_BYTES,
+        help="bytes of each input processed per step",
+    )
+    add_files_parser.add_argument(
+        "--workers", type=int, default=1, help="number of threads"
+    )
+    add_files_parser.set_defaults(func=add_files)
+
+    sum_parser = subparsers.add_parser(
+        "sum", help="sum newline- or CSV-delimited numbers from files or stdin"
+    )
+    sum_parser.add_argument(
+        "files", nargs="*", default=["-"], help="input files, - for stdin (default)"
+    )
+    sum_parser.add_argument(
+        "--mode",
+        choices=lib.FLOAT_SUM_MODES,
+        help=(
+            "float summation mode (default: exact for the python engine, chosen "
+            "by lib.sum_floats for numpy); modes other than exact round the sum "
+            "of each read block, so their results depend on the block size"
+        ),
+    )
+    sum_parser.add_argument(
+        "--type", choices=["float", "int"], default="float", help="number type"
+    )
+    sum_parser.add_argument(
+        "--delimiter", default=",", help="column delimiter of CSV input"
+    )
+    sum_parser.add_argument(
+        "--column",
+        type=int,
+        help="index of the CSV column holding the numbers (default: 0)",
+    )
+    sum_parser.add_argument(
+        "--key-column", type=int, help="index of a CSV column to group sums by"
+    )
+    sum_parser.add_argument(
+        "--skip-header", action="store_true", help="skip the first line of each file"
+    )
+    sum_parser.add_argument(
+        "--engine",
+        choices=["python", "numpy"],
+        default="python",
+        help="parser backend for floats; numpy is only imported when selected",
+    )
+    sum_parser.set_defaults(func=sum_numbers)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "sum" and args.type == "int" and args.engine == "numpy":
+        parser.error("--engine numpy only parses --type float")
+    if args.command == "add-files" and args.workers < 1:
+        parser.error(f"--workers must be at least 1, got {args.workers}")
+    if args.command is None:
+        print("Hello from pytest-minimal-example!")
+        return 0
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
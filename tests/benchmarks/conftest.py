@@ -0,0 +1,110 @@
+import gc
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+
+# Minimum duration of one timed run; fast functions are looped to reach it.
+_MIN_RUN_SECONDS = 0.02
+
+
+def _time_run(func, loops):
+    # Like timeit, keep garbage collection pauses out of the measurement.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return (time.perf_counter() - started) / loops
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(func, warmup=1, repeat=7):
+    """Time a function with warmup and repeated runs.
+
+    Like ``timeit``, fast functions are called in loops so that each run takes
+    at least a few milliseconds.
+
+    Args:
+        func: Function called without arguments
+        warmup: Number of untimed runs first
+        repeat: Number of timed runs
+
+    Returns:
+        A dict of robust statistics of the seconds per call
+    """
+    for _ in range(warmup):
+        func()
+    loops = 1
+    while (elapsed := _time_run(func, loops)) * loops < _MIN_RUN_SECONDS:
+        loops *= 10
+    runs = [elapsed] + [_time_run(func, loops) for _ in range(repeat - 1)]
+    median = statistics.median(runs)
+    quartiles = statistics.quantiles(runs, n=4) if len(runs) > 1 else [median] * 3
+    return {
+        "median": median,
+        "min": min(runs),
+        "mad": statistics.median(abs(run - median) for run in runs),
+        "iqr": quartiles[2] - quartiles[0],
+        "runs": len(runs),
+        "loops": loops,
+    }
+
+
+@pytest.fixture(scope="session")
+def lib_benchmark_results(request):
+    """Session-scoped results of all benchmarks, saved as JSON at the end."""
+    results = {}
+    yield results
+    path = request.config.getoption("--lib-benchmark-save")
+    if path and results:
+        baseline = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        Path(path).write_text(json.dumps(baseline, indent=2, sort_keys=True))
+
+
+@pytest.fixture(scope="session")
+def lib_benchmark_baseline(request):
+    """Results of the baseline given by --lib-benchmark-compare, if any."""
+    path = request.config.getoption("--lib-benchmark-compare")
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text())["results"]
+
+
+@pytest.fixture
+def lib_benchmark(request, lib_benchmark_results, lib_benchmark_baseline):
+    """Fixture that times a function and checks it against the baseline.
+
+    Returns:
+        A function ``lib_benchmark(func, size)`` returning the statistics
+    """
+    threshold = request.config.getoption("--lib-benchmark-threshold")
+    max_size = request.config.getoption("--lib-benchmark-max-size")
+
+    def run(func, size):
+        if size > max_size:
+            pytest.skip(f"input size {size} is above --lib-benchmark-max-size")
+        stats = measure(func)
+        name = request.node.name
+        lib_benchmark_results[name] = stats
+        baseline = lib_benchmark_baseline.get(name)
+        if baseline is not None:
+            # The best run is the least affected by other load on the machine.
+            limit = baseline["min"] * (1 + threshold)
+            assert stats["min"] <= limit, (
+                f"{name} regressed: best run {stats['min']:.3g} s, "
+                f"baseline {baseline['min']:.3g} s (limit {limit:.3g} s)"
+            )
+        return stats
+
+    return run
@@ -0,0 +1,125 @@
+"""
+Benchmarks of lib's summation functions.
+
+They are deselected by default. Run them, save a baseline and compare
+against it with:
+
+    pytest -m benchmark tests/benchmarks --lib-benchmark-save baseline.json
+    pytest -m benchmark tests/benchmarks --lib-benchmark-compare baseline.json
+"""
+
+import os
+import threading
+from functools import cache, reduce
+
+import pytest
+from lib import ConcurrentSum, sum_many, sum_nested, sum_objects, sum_stream
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [1, 1_000, 100_000, 10_000_000]
+
+# Folding sum_objects over these types copies the accumulator at every step.
+_COPYING_FAMILIES = {"str", "list", "bytes"}
+_MAX_COPYING_FOLD_SIZE = 10_000
+
+_ITEM_FACTORIES = {
+    "int": lambda n: n,
+    "big_int": lambda n: 2**200 + n,
+    "float": lambda n: n * 0.5,
+    "str": lambda n: "x",
+    "list": lambda n: [n],
+    "bytes": lambda n: b"x",
+}
+
+
+@cache
+def make_items(family, size):
+    """Build (and cache) the input list of a type family."""
+    return [_ITEM_FACTORIES[family](n) for n in range(size)]
+
+
+@cache
+def make_nested(size):
+    """Build a nested list of lists of ten integers with size leaves."""
+    leaves = list(range(size))
+    return [leaves[index : index + 10] for index in range(0, size, 10)]
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("family", list(_ITEM_FACTORIES))
+def test_benchmark_sum_objects_fold(lib_benchmark, family, size):
+    """Benchmark the pairwise reduction that sum_many replaces."""
+    if family in _COPYING_FAMILIES and size > _MAX_COPYING_FOLD_SIZE:
+        pytest.skip("quadratic pairwise fold")
+    items = make_items(family, size)
+    lib_benchmark(lambda: reduce(sum_objects, items), size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("family", list(_ITEM_FACTORIES))
+def test_benchmark_sum_many(lib_benchmark, family, size):
+    """Benchmark sum_many on homogeneous input."""
+    items = make_items(family, size)
+    lib_benchmark(lambda: sum_many(items), size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_benchmark_sum_stream(lib_benchmark, size):
+    """Benchmark the chunked streaming reduction of a generator."""
+    lib_benchmark(lambda: sum_stream(iter(range(size)), 0), size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_benchmark_sum_nested(lib_benchmark, size):
+    """Benchmark summing the leaves of a nested structure."""
+    nested = make_nested(size)
+    lib_benchmark(lambda: sum_nested(nested), size)
+
+
+# Additions made by each thread of the concurrent benchmarks.
+_ADDS_PER_THREAD = 100_000
+
+THREAD_COUNTS = sorted({1, 2, 4, 8, os.process_cpu_count() or 1})
+
+
+class _LockedSum:
+    """Shared total behind a lock, the baseline ConcurrentSum replaces."""
+
+    def __init__(self):
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add(self, value):
+        with self.lock:
+            self.total = sum_objects(self.total, value)
+
+
+def _add_from_threads(total, threads):
+    barrier = threading.Barrier(threads)
+
+    def work():
+        barrier.wait()
+        for value in range(_ADDS_PER_THREAD):
+            total.add(value)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+@pytest.mark.parametrize("threads", THREAD_COUNTS)
+@pytest.mark.parametrize(
+    "factory",
+    [pytest.param(ConcurrentSum, id="sharded"), pytest.param(_LockedSum, id="locked")],
+)
+def test_benchmark_concurrent_adds(lib_benchmark, factory, threads):
+    """Benchmark threads adding to one total; compare the seconds per call
+    across thread counts to see how throughput scales."""
+    if threads > (os.process_cpu_count() or 1):
+        pytest.skip("more threads than usable CPUs")
+    # The input size is what each thread adds, so that
+    # --lib-benchmark-max-size keeps or skips all thread counts together.
+    lib_benchmark(lambda: _add_from_threads(factory(), threads), _ADDS_PER_THREAD)
@@ -1,9 +1,37 @@
+import lib
 import pytest
 
 # Global counter to track autouse fixture calls
 _autouse_call_count = 0
 
 
+def pytest_addoption(parser):
+    """Command line options of the benchmark suite in tests/benchmarks."""
+    group = parser.getgroup("lib-benchmark")
+    group.addoption(
+        "--lib-benchmark-save",
+        metavar="PATH",
+        help="write benchmark results to a JSON baseline file",
+    )
+    group.addoption(
+        "--lib-benchmark-compare",
+        metavar="PATH",
+        help="fail benchmarks that are slower than in this JSON baseline",
+    )
+    group.addoption(
+        "--lib-benchmark-threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown relative to the baseline (default: 0.25 = 25%%)",
+    )
+    group.addoption(
+        "--lib-benchmark-max-size",
+        type=int,
+        default=100_000,
+        help="skip benchmarks with larger inputs (default: 100000)",
+    )
+
+
 @pytest.fixture(scope="session")
 def test_session_data():
     """Session-scoped fixture that provides shared data for the entire test session."""
@@ -19,6 +47,10 @@ def test_session_data():
     print(
         f"\nTearing down session-scoped fixture - autouse was called {session_config['autouse_calls']} times"
     )
+    # Set SUM_OBJECTS_INSTRUMENT=1 to see where sum_objects spent its time
+    if lib.is_instrumented():
+        session_config["sum_objects_stats"] = lib.instrumentation_snapshot()
+        print(f"\nsum_objects statistics:\n{lib.instrumentation_report()}")
 
 
 @pytest.fixture(autouse=True)
@@ -0,0 +1,201 @@
+"""
+Differential and performance fuzzing of lib's summation engines.
+
+Every engine is run against the reference ``a + b`` on the same generated
+operands and must give an identical result, or raise the same exception type.
+To fuzz a new fast path, add it to ``ENGINES``.
+
+The performance tests are benchmarks, deselected by default. They use
+``hypothesis.target`` to search for operands where an engine is much slower
+than the reference, and fail on them. Hypothesis then shrinks the operands and
+saves them to its example database, so later runs try them first:
+
+    pytest -m benchmark tests/test_differential.py
+"""
+
+import time
+from fractions import Fraction
+
+import pytest
+from hypothesis import HealthCheck, given, settings, strategies as st, target
+from lib import (
+    CachedSum,
+    ConcurrentSum,
+    sum_many,
+    sum_objects,
+    sum_parallel,
+    sum_stream,
+)
+
+
+def reference(a, b):
+    """The semantics every engine must match."""
+    return a + b
+
+
+def _concurrent_sum(a, b):
+    total = ConcurrentSum()
+    total.add(a)
+    total.add(b)
+    return total.snapshot()
+
+
+ENGINES = {
+    "sum_objects": sum_objects,
+    "sum_many": lambda a, b: sum_many([a, b]),
+    "sum_many_start": lambda a, b: sum_many([b], a),
+    "sum_stream": lambda a, b: sum_stream(iter([a, b])),
+    "sum_parallel": lambda a, b: sum_parallel(
+        [a, b], threshold=0, workers=2, executor="thread"
+    ),
+    "cached_sum": CachedSum(),
+    "concurrent_sum": _concurrent_sum,
+}
+
+_scalars = (
+    st.integers()
+    | st.integers(min_value=2**63)
+    | st.floats()
+    | st.fractions()
+    | st.booleans()
+    | st.text(max_size=20)
+    | st.binary(max_size=20)
+    | st.none()
+)
+
+operands = st.recursive(
+    _scalars,
+    lambda children: st.lists(children, max_size=5) | st.tuples(children, children),
+    max_leaves=20,
+)
+
+
+@st.composite
+def operand_pairs(draw):
+    """Pairs of operands, mostly of the same type family, sometimes mixed."""
+    a = draw(operands)
+    same_type = {
+        int: st.integers(),
+        bool: st.integers(),
+        float: st.floats() | st.integers(),
+        Fraction: st.fractions() | st.integers(),
+        str: st.text(max_size=20),
+        bytes: st.binary(max_size=20),
+        list: st.lists(operands, max_size=5),
+        tuple: st.tuples(operands),
+    }.get(type(a))
+    if same_type is not None and draw(st.booleans()):
+        return a, draw(same_type)
+    return a, draw(operands)
+
+
+def run_engine(engine, a, b):
+    """Return ``("ok", result)`` or ``("raised", exception type)``."""
+    try:
+        return "ok", engine(a, b)
+    except Exception as error:
+        return "raised", type(error)
+
+
+def assert_same_outcome(actual, expected):
+    """Check two run_engine outcomes are identical, telling -0.0 from 0.0
+    and treating NaNs as equal to each other."""
+    assert actual[0] == expected[0], f"{actual} != {expected}"
+    if actual[0] == "raised":
+        assert actual[1] is expected[1]
+    else:
+        assert type(actual[1]) is type(expected[1])
+        assert repr(actual[1]) == repr(expected[1])
+
+
+@pytest.mark.parametrize("name", list(ENGINES))
+@given(pair=operand_pairs())
+def test_engine_matches_reference(name, pair):
+    """Every engine gives the same result or exception type as a + b."""
+    a, b = pair
+    assert_same_outcome(run_engine(ENGINES[name], a, b), run_engine(reference, a, b))
+
+
+# Operands that compare and hash equal while their sums differ in type or sign,
+# which a cache keyed by the operands alone would mix up.
+_equal_scalars = st.sampled_from([0, 0.0, -0.0, False, 1, 1.0, True, 0j, Fraction(1)])
+_equal_operands = _equal_scalars | st.tuples(_equal_scalars)
+
+
+@given(
+    pairs=st.lists(
+        operand_pairs() | st.tuples(_equal_operands, _equal_operands), max_size=20
+    )
+)
+def test_shared_cached_sum_matches_reference(pairs):
+    """One CachedSum gives the same results as a + b over a sequence of
+    pairs, so cached results of earlier pairs never leak into later ones."""
+    cached_sum = CachedSum()
+    for a, b in pairs:
+        assert_same_outcome(run_engine(cached_sum, a, b), run_engine(reference, a, b))
+
+
+# Slowdown relative to the reference above which an engine fails, and the
+# smallest reference time a slowdown is computed against, so that the fixed
+# call overhead of an engine on tiny operands does not count as a cliff.
+MAX_SLOWDOWN = 10.0
+_MIN_REFERENCE_SECONDS = 20e-6
+
+
+def best_time(func, *args, repeat=5):
+    """Return the best of several timed calls in seconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def slowdown(engine, a, b):
+    """Time an engine against the reference on the same operands."""
+    engine_seconds = best_time(run_engine, engine, a, b)
+    reference_seconds = best_time(run_engine, reference, a, b)
+    return engine_seconds / max(reference_seconds, _MIN_REFERENCE_SECONDS)
+
+
+# Largest operand the performance tests build, in elements or digits.
+MAX_OPERAND_SIZE = 100_000
+
+_sizes = st.integers(min_value=0, max_value=MAX_OPERAND_SIZE)
+
+
+def _sized(build):
+    """Operands built from a drawn size, which target() can drive up and
+    shrinking can drive down, unlike the lengths of drawn collections."""
+    return st.builds(build, _sizes, st.integers(min_value=0, max_value=9))
+
+
+large_operand_pairs = st.one_of(
+    st.tuples(_sized(lambda n, k: 10**n + k), _sized(lambda n, k: 10**n + k)),
+    st.tuples(_sized(lambda n, k: str(k) * n), _sized(lambda n, k: str(k) * n)),
+    st.tuples(_sized(lambda n, k: bytes([k]) * n), _sized(lambda n, k: bytes(n))),
+    st.tuples(_sized(lambda n, k: [k] * n), _sized(lambda n, k: [k] * n)),
+    st.tuples(_sized(lambda n, k: (k,) * n), _sized(lambda n, k: (k,) * n)),
+    st.tuples(
+        _sized(lambda n, k: Fraction(10**n + k, 3)),
+        _sized(lambda n, k: Fraction(1, n + 1)),
+    ),
+    operand_pairs(),
+)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name", list(ENGINES))
+@settings(
+    deadline=None,
+    max_examples=200,
+    suppress_health_check=[HealthCheck.too_slow, HealthCheck.data_too_large],
+)
+@given(pair=large_operand_pairs)
+def test_engine_has_no_performance_cliff(name, pair):
+    """No engine is much slower than a + b on any operands."""
+    a, b = pair
+    ratio = slowdown(ENGINES[name], a, b)
+    target(ratio, label=f"{name} slowdown")
+    assert ratio <= MAX_SLOWDOWN, f"{name} is {ratio:.1f}x slower than a + b"
@@ -1,7 +1,7 @@
 import pytest
 from hypothesis import given, strategies as st, example, settings, note
 from hypothesis.stateful import RuleBasedStateMachine, rule, invariant
-from lib import sum_objects
+from lib import Accumulator, Rope, sum_objects, sum_many, sum_nested
 
 
 class TestSumObjectsWithHypothesis:
@@ -71,6 +71,27 @@ class TestSumObjectsWithHypothesis:
         assert result[: len(a)] == a
         assert result[len(a) :] == b
 
+    @given(st.text(), st.text())
+    def test_sum_strings_lazy_property(self, a, b):
+        """String concatenation properties hold on the lazy Rope result."""
+        result = sum_objects(a, b, lazy=True)
+
+        assert isinstance(result, Rope)
+        assert len(result) == len(a) + len(b)
+        assert result.startswith(a)
+        assert result.endswith(b)
+        assert result == a + b
+
+    @given(st.lists(st.integers()), st.lists(st.integers()))
+    def test_sum_lists_lazy_property(self, a, b):
+        """List concatenation properties hold on the lazy Rope result."""
+        result = sum_objects(a, b, lazy=True)
+
+        assert len(result) == len(a) + len(b)
+        assert result[: len(a)] == a
+        assert result[len(a) :] == b
+        assert result.materialize() == a + b
+
     @given(st.one_of(st.integers(), st.floats(allow_nan=False)), st.text(min_size=1))
     def test_sum_incompatible_types_raises_error(self, number, text):
         """Property-based test: incompatible types should raise TypeError."""
@@ -153,6 +174,21 @@ class TestAdvancedHypothesis:
         expected = sum(numbers)
         assert result == expected
 
+    @given(
+        st.one_of(
+            st.lists(st.integers(), min_size=1),
+            st.lists(st.text(), min_size=1),
+            st.lists(st.lists(st.integers()), min_size=1),
+        )
+    )
+    def test_sum_many_matches_pairwise(self, items):
+        """sum_many fast paths should agree with folding sum_objects."""
+        expected = items[0]
+        for item in items[1:]:
+            expected = sum_objects(expected, item)
+
+        assert sum_many(items) == expected
+
     @given(st.dictionaries(st.text(min_size=1, max_size=5), st.integers(), min_size=1))
     def test_sum_dict_values(self, test_dict):
         """Test summing dictionary values."""
@@ -207,6 +243,28 @@ class TestAdvancedHypothesis:
         expected = sum(flattened) if flattened else 0
         assert result == expected
 
+    @given(
+        st.recursive(
+            st.integers(),
+            lambda children: (
+                st.lists(children, max_size=3) | st.tuples(children, children)
+            ),
+            max_leaves=50,
+        )
+    )
+    def test_sum_nested_matches_recursive_sum(self, nested_data):
+        """sum_nested should agree with a recursive sum_objects reduction."""
+
+        def recursive_sum(data):
+            if isinstance(data, int):
+                return data
+            total = 0
+            for item in data:
+                total = sum_objects(total, recursive_sum(item))
+            return total
+
+        assert sum_nested(nested_data) == recursive_sum(nested_data)
+
 
 class CalculatorStateMachine(RuleBasedStateMachine):
     """Stateful testing example using Hypothesis."""
@@ -254,6 +312,36 @@ class CalculatorStateMachine(RuleBasedStateMachine):
 TestCalculatorStateMachine = CalculatorStateMachine.TestCase
 
 
+class AccumulatorStateMachine(RuleBasedStateMachine):
+    """Stateful test driving an Accumulator like the calculator above."""
+
+    def __init__(self):
+        super().__init__()
+        self.accumulator = Accumulator(0)
+        self.total = 0
+
+    @rule(value=st.integers(min_value=-1000, max_value=1000))
+    def add_number(self, value):
+        """Rule: add a number to the accumulator."""
+        self.accumulator.add(value)
+        self.total = sum_objects(self.total, value)
+
+    @rule(values=st.lists(st.integers(min_value=-1000, max_value=1000)))
+    def merge_partial(self, values):
+        """Rule: merge a partial accumulator built elsewhere."""
+        partial = Accumulator.from_bytes(Accumulator().add_many(values).to_bytes())
+        self.accumulator.merge(partial)
+        self.total = sum_objects(self.total, sum(values))
+
+    @invariant()
+    def totals_agree(self):
+        """Invariant: the accumulator matches the reference total."""
+        assert self.accumulator.result() == self.total
+
+
+TestAccumulatorStateMachine = AccumulatorStateMachine.TestCase
+
+
 @pytest.mark.hypothesis
 class TestHypothesisIntegration:
     """Tests demonstrating Hypothesis integration with pytest features."""
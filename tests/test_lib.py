@@ -1,5 +1,46 @@
+import asyncio
+import concurrent.futures
+import math
+from array import array
+from decimal import Decimal, localcontext
+from fractions import Fraction
+
+import lib
 import pytest
-from lib import sum_objects
+from lib import (
+    Accumulator,
+    AsyncAccumulator,
+    CachedSum,
+    ConcurrentSum,
+    RangeSumTree,
+    Rope,
+    SlidingWindowSum,
+    add_elementwise,
+    add_series,
+    concat_buffers,
+    gather_buffers,
+    instrumentation_report,
+    instrumented,
+    is_instrumented,
+    iter_add_series,
+    iter_sum_by_key,
+    merge_sum,
+    prefix_sums,
+    register,
+    running_sums,
+    sum_async,
+    sum_by_key,
+    sum_decimals,
+    sum_files,
+    sum_floats,
+    sum_fractions,
+    sum_many,
+    sum_nested,
+    sum_objects,
+    sum_objects_batch,
+    sum_parallel,
+    sum_stream,
+)
 
 
 @pytest.mark.parametrize(
@@ -124,3 +165,1068 @@ def test_simple_without_explicit_fixtures():
     result = sum_objects(1, 1)
     assert result == 2
     print("\nThis test doesn't use explicit fixtures, but autouse should still run!")
+
+
+@pytest.mark.parametrize(
+    "items,start,expected",
+    [
+        pytest.param([1, 2, 3], 0, 6, id="integers"),
+        pytest.param([1.5, 2.5], 0.0, 4.0, id="floats"),
+        pytest.param(["a", "b", "c"], "", "abc", id="strings"),
+        pytest.param([b"ab", b"cd"], b"", b"abcd", id="bytes"),
+        pytest.param([[1], [2, 3]], [], [1, 2, 3], id="lists"),
+        pytest.param([1, 2.5, True], 0, 4.5, id="mixed_numbers"),
+        pytest.param([], 5, 5, id="empty_with_start"),
+    ],
+)
+def test_sum_many(items, start, expected):
+    """Test sum_many with homogeneous and mixed inputs."""
+    result = sum_many(items, start)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+def test_sum_many_defaults_to_first_item():
+    """Without a start value, sum_many starts from the first item."""
+    assert sum_many(iter(["x", "y"])) == "xy"
+    with pytest.raises(TypeError):
+        sum_many([])
+
+
+def test_sum_many_does_not_mutate_start():
+    """The list fast path must build a new list like pairwise ``+`` does."""
+    start = [0]
+    assert sum_many([[1], [2]], start) == [0, 1, 2]
+    assert start == [0]
+
+
+@pytest.mark.parametrize(
+    "items,start",
+    [
+        pytest.param(["a", "b"], 0, id="strings_with_int_start"),
+        pytest.param([1, "a"], 0, id="mixed_int_string"),
+    ],
+)
+def test_sum_many_type_errors(items, start):
+    """Test that sum_many raises TypeError like sum_objects."""
+    with pytest.raises(TypeError):
+        sum_many(items, start)
+
+
+@pytest.mark.parametrize(
+    "as_,bs,expected",
+    [
+        pytest.param([1, 2], [3, 4], [4, 6], id="integers"),
+        pytest.param(["a", "b"], ["c", "d"], ["ac", "bd"], id="strings"),
+        pytest.param([[1], []], [[2], [3]], [[1, 2], [3]], id="lists"),
+        pytest.param([], [], [], id="empty"),
+    ],
+)
+def test_sum_objects_batch(as_, bs, expected):
+    """Test elementwise summing of object columns."""
+    assert sum_objects_batch(as_, bs) == expected
+
+
+def test_sum_objects_batch_errors():
+    """Columns must have equal lengths and summable pairs."""
+    with pytest.raises(ValueError):
+        sum_objects_batch([1, 2], [1])
+    with pytest.raises(TypeError):
+        sum_objects_batch([1, "a"], [2, 3])
+
+
+def test_sum_objects_batch_out():
+    """Results are written into a caller-supplied output sequence."""
+    out = [None, None]
+    assert sum_objects_batch([1, 2], [3, 4], out=out) is out
+    assert out == [4, 6]
+
+
+def test_sum_objects_batch_numpy():
+    """Numeric arrays and buffers are summed by numpy with broadcasting."""
+    np = pytest.importorskip("numpy")
+    from array import array
+
+    a = np.arange(6, dtype=np.int64).reshape(2, 3)
+    assert (sum_objects_batch(a, 1) == a + 1).all()
+    assert (sum_objects_batch(a, np.arange(3)) == a + np.arange(3)).all()
+
+    out = np.empty(3)
+    result = sum_objects_batch(array("d", [1, 2, 3]), np.ones(3), out=out)
+    assert result is out
+    assert out.tolist() == [2.0, 3.0, 4.0]
+
+    with pytest.raises(ValueError):
+        sum_objects_batch(np.ones(2), np.ones(3))
+
+
+@pytest.mark.parametrize("mode", ["naive", "pairwise", "kahan", "exact", None])
+def test_sum_floats_modes(mode):
+    """Every mode sums well-conditioned input and reports a valid error bound."""
+    values = [0.1] * 1000
+    exact = math.fsum(values)
+    total, bound = sum_floats(values, mode=mode, error_bound=True)
+    assert abs(total - exact) <= bound
+    assert sum_floats(iter(values), mode=mode) == total
+
+
+def test_sum_floats_exact_cancellation():
+    """Exact mode survives catastrophic cancellation that naive mode does not."""
+    values = [1e100, 1.0, -1e100]
+    assert sum_floats(values, mode="naive") == 0.0
+    assert sum_floats(values, mode="exact") == 1.0
+    assert sum_floats(values) == 1.0
+
+
+def test_sum_floats_chunked():
+    """Chunked input is reduced as if it were one flat sequence."""
+    chunks = [[0.1] * 300, [0.2] * 200, []]
+    flat = [value for chunk in chunks for value in chunk]
+    for mode in ["naive", "pairwise", "kahan", "exact"]:
+        assert sum_floats(chunks, mode=mode, chunked=True) == sum_floats(
+            flat, mode=mode
+        )
+
+
+@pytest.mark.parametrize("mode", ["naive", "pairwise", "kahan", "exact"])
+def test_sum_floats_numpy(mode):
+    """Numpy arrays and chunks get the same accuracy and bound as lists."""
+    np = pytest.importorskip("numpy")
+    values = np.array([1e16] + [1.0] * 100_000)
+    exact = math.fsum(values.tolist())
+    for input_values, chunked in [(values, False), (np.array_split(values, 4), True)]:
+        total, bound = sum_floats(
+            input_values, mode=mode, chunked=chunked, error_bound=True
+        )
+        assert type(total) is float
+        assert abs(total - exact) <= bound
+
+
+def test_sum_floats_unknown_mode():
+    """Unknown modes are rejected."""
+    with pytest.raises(ValueError):
+        sum_floats([1.0], mode="fast")
+
+
+def test_sum_stream_from_generator():
+    """Generators are consumed chunk by chunk without materializing them."""
+    numbers = (n for n in range(10_001))
+    assert sum_stream(numbers, 0, chunk_size=64) == sum(range(10_001))
+    assert sum_stream((str(n) for n in range(5)), chunk_size=2) == "01234"
+    assert sum_stream([], start=7) == 7
+    with pytest.raises(TypeError):
+        sum_stream(iter([]))
+    with pytest.raises(ValueError):
+        sum_stream([1], chunk_size=0)
+
+
+def test_running_sums_consumes_one_chunk_at_a_time():
+    """Running totals are yielded before the rest of the input is read."""
+    consumed = []
+
+    def feed():
+        for n in range(1, 7):
+            consumed.append(n)
+            yield n
+
+    totals = running_sums(feed(), 0, chunk_size=2)
+    assert next(totals) == 3
+    assert consumed == [1, 2]
+    assert list(totals) == [10, 21]
+
+
+@pytest.mark.parametrize(
+    "items,start,expected",
+    [
+        pytest.param([1, 2, 3], 0, [1, 3, 6], id="integers"),
+        pytest.param(["a", "b", "c"], "_", ["_a", "_ab", "_abc"], id="strings"),
+        pytest.param([[1], [2]], None, [[1], [1, 2]], id="lists_no_start"),
+    ],
+)
+def test_prefix_sums(items, start, expected):
+    """Test per-item prefix totals."""
+    if start is None:
+        assert list(prefix_sums(iter(items))) == expected
+    else:
+        assert list(prefix_sums(iter(items), start)) == expected
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize(
+    "items,start",
+    [
+        pytest.param(list(range(1000)), 0, id="integers"),
+        pytest.param([str(n) for n in range(101)], "", id="strings"),
+        pytest.param([[n] for n in range(101)], [-1], id="lists"),
+    ],
+)
+def test_sum_parallel_keeps_order(items, start, executor):
+    """Parallel sums match sum_many, including for non-commutative types."""
+    result = sum_parallel(
+        items, start, workers=2, shard_size=7, executor=executor, threshold=0
+    )
+    assert result == sum_many(items, start)
+
+
+def test_sum_parallel_serial_fallback():
+    """Small inputs are summed serially and unknown executors are rejected."""
+    with pytest.raises(ValueError):
+        sum_parallel([1, 2], executor="fork")
+    assert sum_parallel([1, 2, 3], executor="thread") == 6
+    assert sum_parallel([], 0) == 0
+    with pytest.raises(ValueError):
+        sum_parallel([1, 2], workers=0)
+    with pytest.raises(ValueError):
+        sum_parallel([1, 2], shard_size=0)
+
+
+def test_sum_parallel_keeps_bulk_sums_serial(monkeypatch):
+    """Inputs sum_many combines in bulk are not sent to workers by default."""
+    monkeypatch.setattr(lib, "PARALLEL_THRESHOLD", 0)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", None)
+    monkeypatch.setattr(lib, "ThreadPoolExecutor", None)
+    assert sum_parallel(range(100), workers=2) == 4950
+    assert sum_parallel(["a", "b", "c"], workers=2) == "abc"
+    # Floats have no bulk path, so they reach the disabled pools.
+    with pytest.raises(TypeError):
+        sum_parallel([1.5, 2.5], workers=2)
+
+
+@pytest.mark.parametrize(
+    "obj,expected",
+    [
+        pytest.param(5, 5, id="single_leaf"),
+        pytest.param([1, [2, [3, (4,)]]], 10, id="lists_and_tuples"),
+        pytest.param([1, None, "skip", [2.5]], 3.5, id="skips_other_objects"),
+        pytest.param((n for n in [1, [2], 3]), 6, id="generator"),
+        pytest.param([[], [[]]], 0, id="empty_containers"),
+        pytest.param(
+            [Fraction(1, 2), [Fraction(1, 3), 1]], Fraction(11, 6), id="fractions"
+        ),
+        pytest.param(
+            [Decimal("0.1"), (Decimal("0.2"),)], Decimal("0.3"), id="decimals"
+        ),
+    ],
+)
+def test_sum_nested(obj, expected):
+    """Test summing leaves of nested structures."""
+    assert sum_nested(obj) == expected
+
+
+def test_sum_nested_deep_structure():
+    """Nesting far beyond the recursion limit is summed without recursion."""
+    root = current = []
+    for n in range(100_000):
+        child = [n]
+        current.append(child)
+        current = child
+    assert sum_nested(root) == sum(range(100_000))
+
+
+def test_sum_nested_custom_types():
+    """Leaf and container types can be chosen by the caller."""
+    words = {"first": ["a", ("b", "c")], "second": ["d"]}
+    dict_values = type(words.values())
+    result = sum_nested(words.values(), "", str, (list, tuple, dict_values))
+    assert result == "abcd"
+
+
+class Money:
+    """Minimal domain type with a slow generic __add__."""
+
+    def __init__(self, cents):
+        self.cents = cents
+
+    def __add__(self, other):
+        raise AssertionError("generic __add__ should be bypassed")
+
+
+class Euro(Money):
+    pass
+
+
+@pytest.fixture
+def restore_registry():
+    """Remove the handlers a test registers once it is done."""
+    registry = dict(lib._registry)
+    yield
+    lib._registry.clear()
+    lib._registry.update(registry)
+    lib._dispatch_cache.clear()
+
+
+def test_register_bypasses_add(restore_registry):
+    """Registered handlers are used for their types and subclasses."""
+
+    @register(Money, Money)
+    def add_money(a, b):
+        return Money(a.cents + b.cents)
+
+    assert sum_objects(Money(1), Money(2)).cents == 3
+    assert sum_objects(Euro(1), Money(2)).cents == 3
+
+    @register(Euro, Money)
+    def add_euro(a, b):
+        return Euro(a.cents + b.cents)
+
+    # The new registration invalidates the cached resolution for (Euro, Money)
+    assert isinstance(sum_objects(Euro(1), Money(2)), Euro)
+    assert sum_many([Money(1), Money(2), Money(3)]).cents == 6
+    assert sum_objects(1, 2) == 3
+
+
+def test_sum_parallel_uses_registered_handlers(restore_registry, monkeypatch):
+    """With handlers registered, shards are summed by threads that see them
+    rather than by processes that may not."""
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", None)
+    register(Money, Money)(lambda a, b: Money(a.cents + b.cents))
+    items = [Money(cents) for cents in range(10)]
+    assert sum_parallel(items, threshold=0, workers=2).cents == 45
+
+
+def test_accumulator_add_and_statistics():
+    """Accumulators track the total, count, min and max of added values."""
+    accumulator = Accumulator(0).add(5).add(-3).add_many([10, 2])
+    assert accumulator.result() == 14
+    assert (accumulator.count, accumulator.min, accumulator.max) == (4, -3, 10)
+    assert not hasattr(accumulator, "__dict__")
+
+    with pytest.raises(TypeError):
+        Accumulator().result()
+
+
+def test_accumulator_unorderable_values():
+    """Unorderable values are summed without min/max, and failed additions
+    leave the accumulator unchanged."""
+    accumulator = Accumulator(0).add_many([1j, 2j]).add(3)
+    assert accumulator.result() == 3 + 3j
+    assert (accumulator.count, accumulator.min, accumulator.max) == (3, None, None)
+
+    merged = Accumulator().add_many([1, 2]).merge(Accumulator().add(1j))
+    assert (merged.count, merged.min, merged.max) == (3, None, None)
+
+    accumulator = Accumulator(0).add(5)
+    with pytest.raises(TypeError):
+        accumulator.add_many([1, "a"])
+    with pytest.raises(TypeError):
+        accumulator.add("a")
+    assert repr(accumulator) == repr(Accumulator(0).add(5))
+
+
+@pytest.mark.parametrize(
+    "left,right,expected",
+    [
+        pytest.param([1, 2], [3], 6, id="integers"),
+        pytest.param(["a", "b"], ["c"], "abc", id="strings_keep_order"),
+        pytest.param([], [1.5], 1.5, id="empty_left"),
+        pytest.param([2], [], 2, id="empty_right"),
+    ],
+)
+def test_accumulator_merge(left, right, expected):
+    """Merging partial accumulators equals accumulating everything at once."""
+    merged = Accumulator().add_many(left).merge(Accumulator().add_many(right))
+    assert merged.result() == expected
+    assert merged.count == len(left) + len(right)
+    assert merged.min == min(left + right)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        pytest.param([], id="empty"),
+        pytest.param([2**100, -(2**70), 0], id="big_integers"),
+        pytest.param([0.1, -2.5], id="floats"),
+        pytest.param(["héllo", "wörld"], id="strings"),
+        pytest.param([b"\x00", b"\xff"], id="bytes"),
+    ],
+)
+def test_accumulator_serialization_round_trip(values):
+    """Accumulators survive a to_bytes/from_bytes round trip."""
+    accumulator = Accumulator().add_many(values)
+    restored = Accumulator.from_bytes(accumulator.to_bytes())
+    assert repr(restored) == repr(accumulator)
+
+
+def test_accumulator_serialization_errors():
+    """Unsupported values and corrupt data are rejected."""
+    with pytest.raises(TypeError):
+        Accumulator().add([1]).to_bytes()
+    with pytest.raises(ValueError):
+        Accumulator.from_bytes(Accumulator(0).add(1).to_bytes()[:-1])
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        pytest.param(list(range(-20, 20)), id="integers_by_subtraction"),
+        pytest.param(
+            [Fraction(n, 7) for n in range(20)], id="fractions_by_subtraction"
+        ),
+        pytest.param([str(n) for n in range(20)], id="strings_by_two_stacks"),
+        pytest.param([[n] for n in range(20)], id="lists_by_two_stacks"),
+    ],
+)
+@pytest.mark.parametrize("size", [1, 3, 8])
+def test_sliding_window_sum(values, size):
+    """The window sum always equals the sum of the last ``size`` values."""
+    window = SlidingWindowSum(size)
+    for count, value in enumerate(values, start=1):
+        window.append(value)
+        recent = values[max(0, count - size) : count]
+        assert len(window) == len(recent)
+        assert window.result() == sum_many(recent)
+
+
+def test_sliding_window_sum_does_not_subtract_decimals():
+    """Rounded Decimal additions cannot be undone by subtraction."""
+    window = SlidingWindowSum(2)
+    for value in [Decimal("1e30"), Decimal(1), Decimal(1)]:
+        window.append(value)
+    assert window.result() == 2
+
+
+@pytest.mark.parametrize("size", [1, 2, 3])
+def test_sliding_window_sum_stops_subtracting_floats(size):
+    """Floats appended after ints switch the window to two-stack aggregation
+    instead of subtracting them."""
+    values = [0, 7, 1e16, 1.0, 1.0, 1.0]
+    window = SlidingWindowSum(size)
+    for count, value in enumerate(values, start=1):
+        window.append(value)
+        assert window.result() == sum_many(values[max(0, count - size) : count])
+
+
+def test_sliding_window_sum_start_and_errors():
+    """Empty windows need a start value."""
+    assert SlidingWindowSum(2, start=0).result() == 0
+    with pytest.raises(TypeError):
+        SlidingWindowSum(2).result()
+    with pytest.raises(ValueError):
+        SlidingWindowSum(0)
+
+
+def test_range_sum_tree():
+    """Range queries follow point updates and appends."""
+    tree = RangeSumTree(["a", "b", "c"])
+    tree.append("d")
+    tree.append("e")
+    tree[1] = "B"
+    assert len(tree) == 5
+    assert tree[1] == "B"
+    assert tree.query(0, 5) == "aBcde"
+    assert tree.query(1, 4) == "Bcd"
+    assert tree.query(2, 2, "") == ""
+
+    with pytest.raises(TypeError):
+        tree.query(2, 2)
+    with pytest.raises(IndexError):
+        tree.query(0, 6)
+
+
+@pytest.mark.parametrize("start,stop", [(0, 100), (13, 14), (5, 77), (99, 100)])
+def test_range_sum_tree_integers(start, stop):
+    """Integer range sums match slicing."""
+    values = list(range(100))
+    assert RangeSumTree(values).query(start, stop) == sum(values[start:stop])
+
+
+def test_concat_buffers():
+    """Any buffer-protocol objects are concatenated into one bytearray."""
+    buffers = [b"ab", bytearray(b"cd"), memoryview(b"e-f-g")[::2], b""]
+    result = concat_buffers(buffers)
+    assert isinstance(result, bytearray)
+    assert result == b"abcdefg"
+    assert concat_buffers([]) == b""
+    assert sum_many([bytearray(b"ab"), bytearray(b"c")]) == bytearray(b"abc")
+
+
+def test_concat_buffers_into_out():
+    """A caller-supplied buffer is filled and the byte count returned."""
+    out = bytearray(8)
+    assert concat_buffers([b"ab", b"cd"], out=out) == 4
+    assert out == b"abcd\x00\x00\x00\x00"
+
+    with pytest.raises(ValueError):
+        concat_buffers([b"abc"], out=bytearray(2))
+    with pytest.raises(TypeError):
+        concat_buffers([b"abc"], out=bytes(3))
+    with pytest.raises(TypeError):
+        concat_buffers(["abc"])
+
+
+def test_gather_buffers_does_not_copy():
+    """Gathered views share memory with the original buffers."""
+    data = bytearray(b"abc")
+    views = gather_buffers([data, b"", b"de"])
+    data[0] = ord("x")
+    assert [bytes(view) for view in views] == [b"xbc", b"de"]
+
+
+def test_rope_builds_strings_lazily():
+    """Repeated lazy concatenation only materializes on demand."""
+    log = ""
+    for line in ["first\n", "second\n", "third\n"]:
+        log = sum_objects(log, line, lazy=True)
+    assert isinstance(log, Rope)
+    assert len(log) == 19
+    assert log[6:12] == "second"
+    assert log[-2] == "d"
+    assert "".join(log) == log.materialize() == "first\nsecond\nthird\n"
+
+
+def test_rope_branches_do_not_interfere():
+    """Ropes that share storage keep their own contents."""
+    base = sum_objects([1], [2], lazy=True)
+    left = base + [3]
+    right = base + [4]
+    assert (base, left, right) == ([1, 2], [1, 2, 3], [1, 2, 4])
+    assert [0] + base == [0, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "needle", ["o w", "hello world", "lo", "d", "", "xyz", "world!", "llo wo"]
+)
+def test_rope_contains_like_str(needle):
+    """Substring search matches str, also across several chunks."""
+    rope = Rope("hel") + "lo" + " " + "w" + "orld"
+    assert (needle in rope) == (needle in "hello world")
+
+
+def test_rope_contains_and_prefixes():
+    """List ropes test membership, and prefixes may be given as tuples."""
+    assert 3 in Rope([1, 2]) + [3]
+    assert [1] not in Rope([1, 2])
+    with pytest.raises(TypeError):
+        1 in Rope("abc")
+
+    rope = Rope("hello") + " world"
+    assert rope.startswith(("x", "h"))
+    assert rope.endswith(("x", "world"))
+    assert not rope.startswith(("x", "world"))
+
+
+@pytest.mark.parametrize(
+    "a,b",
+    [
+        pytest.param("text", 1, id="string_with_number"),
+        pytest.param([1], "text", id="list_with_string"),
+    ],
+)
+def test_rope_type_errors(a, b):
+    """Lazy mode raises TypeError for the same operands as eager mode."""
+    with pytest.raises(TypeError):
+        sum_objects(a, b, lazy=True)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sum_files_npy(tmp_path, workers):
+    """Two .npy files are summed chunk by chunk into a new .npy file."""
+    np = pytest.importorskip("numpy")
+    a = np.arange(10_001, dtype=np.float64)
+    b = np.full_like(a, 0.5)
+    np.save(tmp_path / "a.npy", a)
+    np.save(tmp_path / "b.npy", b)
+
+    count = sum_files(
+        tmp_path / "a.npy",
+        tmp_path / "b.npy",
+        tmp_path / "out.npy",
+        chunk_bytes=4096,
+        workers=workers,
+    )
+    assert count == a.size
+    assert (np.load(tmp_path / "out.npy") == a + b).all()
+
+
+def test_sum_files_keeps_inputs(tmp_path):
+    """An output that is one of the inputs is rejected before it is written."""
+    np = pytest.importorskip("numpy")
+    np.save(tmp_path / "a.npy", np.arange(5))
+    np.save(tmp_path / "b.npy", np.arange(5))
+
+    for out_path in (tmp_path / "a.npy", tmp_path / "." / "b.npy"):
+        with pytest.raises(ValueError):
+            sum_files(tmp_path / "a.npy", tmp_path / "b.npy", out_path)
+    assert np.load(tmp_path / "a.npy").tolist() == [0, 1, 2, 3, 4]
+    assert np.load(tmp_path / "b.npy").tolist() == [0, 1, 2, 3, 4]
+
+
+def test_sum_files_raw(tmp_path):
+    """Raw binary files need a dtype and matching sizes."""
+    np = pytest.importorskip("numpy")
+    np.arange(100, dtype=np.int32).tofile(tmp_path / "a.raw")
+    np.ones(100, dtype=np.int32).tofile(tmp_path / "b.raw")
+    np.ones(99, dtype=np.int32).tofile(tmp_path / "short.raw")
+
+    sum_files(tmp_path / "a.raw", tmp_path / "b.raw", tmp_path / "out.raw", "int32")
+    out = np.fromfile(tmp_path / "out.raw", dtype=np.int32)
+    assert (out == np.arange(1, 101)).all()
+
+    with pytest.raises(ValueError):
+        sum_files(tmp_path / "a.raw", tmp_path / "b.raw", tmp_path / "out.raw")
+    with pytest.raises(ValueError):
+        sum_files(
+            tmp_path / "a.raw", tmp_path / "short.raw", tmp_path / "out.raw", "int32"
+        )
+    with pytest.raises(ValueError):
+        sum_files(
+            tmp_path / "a.raw",
+            tmp_path / "b.raw",
+            tmp_path / "out.raw",
+            "int32",
+            workers=0,
+        )
+
+
+def test_sum_by_key():
+    """Values are summed per key in record order."""
+    records = (pair for pair in [("a", 1), ("b", "x"), ("a", 2), ("b", "y")])
+    assert sum_by_key(records) == {"a": 3, "b": "xy"}
+    assert sum_by_key([]) == {}
+    with pytest.raises(TypeError):
+        sum_by_key([("a", 1), ("a", "x")])
+
+
+def test_merge_sum():
+    """Mappings are merged key-wise in argument order."""
+    merged = merge_sum({"a": 1, "b": [1]}, {"b": [2], "c": 0.5}, {"a": 10})
+    assert merged == {"a": 11, "b": [1, 2], "c": 0.5}
+    assert merge_sum() == {}
+
+
+@pytest.mark.parametrize("max_keys", [1, 3, 100])
+def test_iter_sum_by_key_spills_partial_sums(tmp_path, max_keys):
+    """Spilling to disk gives the same totals, in order per key."""
+    records = [(n % 7, str(n)) for n in range(200)]
+    totals = dict(iter_sum_by_key(records, max_keys, partitions=3, spill_dir=tmp_path))
+    assert totals == sum_by_key(records)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        pytest.param([Fraction(1, n) for n in range(1, 200)], id="harmonic"),
+        pytest.param([Fraction(n, 100) for n in range(-50, 500)], id="cents"),
+        pytest.param([Fraction(1, 3), 2, Fraction(-7, 6)], id="with_integers"),
+    ],
+)
+def test_sum_fractions_matches_pairwise(values):
+    """Deferred normalization gives exactly the pairwise result."""
+    expected = Fraction(0)
+    for value in values:
+        expected = sum_objects(expected, value)
+    result = sum_fractions(values)
+    assert result == expected
+    assert (result.numerator, result.denominator) == (
+        expected.numerator,
+        expected.denominator,
+    )
+    assert sum_many(values[1:], values[0]) == expected
+
+
+def test_sum_decimals_rounds_once():
+    """Decimals are summed exactly and rounded to the context once."""
+    amounts = [Decimal("0.10")] * 1000
+    assert str(sum_decimals(amounts)) == str(sum(amounts, Decimal(0))) == "100.00"
+
+    with localcontext() as context:
+        context.prec = 3
+        values = [Decimal("1.00"), Decimal("0.004"), Decimal("0.004")]
+        assert sum(values, Decimal(0)) == Decimal("1.00")
+        assert sum_decimals(values) == Decimal("1.01")
+    assert sum_decimals([]) == 0
+
+
+def test_instrumentation_records_type_pairs():
+    """Instrumented calls are counted per type pair, including TypeErrors."""
+    was_instrumented = is_instrumented()
+    with instrumented(slow_call_seconds=0) as snapshot:
+        assert is_instrumented()
+        lib.sum_objects("ab", "c")
+        with pytest.raises(TypeError):
+            lib.sum_objects(1, "a")
+        stats = snapshot()
+    assert is_instrumented() == was_instrumented
+
+    assert stats["pairs"]["str+str"]["calls"] >= 1
+    assert stats["pairs"]["str+str"]["max_operand_size"] >= 2
+    assert stats["pairs"]["int+str"]["errors"] >= 1
+    assert stats["slow_calls"]
+    assert "int+str" in instrumentation_report()
+
+
+def test_instrumentation_records_keyed_sums():
+    """Reductions that use plain + for speed go through sum_objects while
+    it is instrumented."""
+    with instrumented() as snapshot:
+        calls = snapshot()["pairs"].get("float+float", {}).get("calls", 0)
+        assert sum_by_key([("a", 1.5), ("a", 2.5), ("b", 1.0)]) == {
+            "a": 4.0,
+            "b": 1.0,
+        }
+        assert snapshot()["pairs"]["float+float"]["calls"] == calls + 1
+
+
+@pytest.mark.parametrize(
+    "a,b,expected",
+    [
+        pytest.param([1, 2], [3, 4], [4, 6], id="vector"),
+        pytest.param(
+            [[1, 2], [3, 4]], [[10, 20], [30, 40]], [[11, 22], [33, 44]], id="matrix"
+        ),
+        pytest.param(
+            [[[1.5]], [[2]]], [[[1]], [[0.5]]], [[[2.5]], [[2.5]]], id="tensor"
+        ),
+        pytest.param(([1], [2]), [[3], [4]], [[4], [6]], id="tuples"),
+        pytest.param([[2**70]], [[1]], [[2**70 + 1]], id="big_int"),
+        pytest.param([["a", "b"]], [["c", "d"]], [["ac", "bd"]], id="strings"),
+        pytest.param([[], []], [[], []], [[], []], id="empty_rows"),
+        pytest.param(1, 2, 3, id="scalars"),
+    ],
+)
+def test_add_elementwise(a, b, expected):
+    """Leaves at matching positions are summed and the shape is kept."""
+    assert add_elementwise(a, b) == expected
+
+
+def test_add_elementwise_out_and_as_array():
+    """Results can be written into out or returned as a shaped memoryview."""
+    a = [[1, 2, 3], [4, 5, 6]]
+    out = [[0, 0, 0], [0, 0, 0]]
+    assert add_elementwise(a, a, out=out) is out
+    assert out == [[2, 4, 6], [8, 10, 12]]
+
+    flat = array("d", [0.0] * 6)
+    assert add_elementwise(a, a, out=flat) is flat
+    assert flat.tolist() == [2, 4, 6, 8, 10, 12]
+
+    view = add_elementwise(a, [[0.5] * 3] * 2, as_array=True)
+    assert view.shape == (2, 3)
+    assert view.tolist() == [[1.5, 2.5, 3.5], [4.5, 5.5, 6.5]]
+    with pytest.raises(TypeError):
+        add_elementwise([["a"]], [["b"]], as_array=True)
+
+
+@pytest.mark.parametrize(
+    "a,b",
+    [
+        pytest.param([[1, 2], [3]], [[1, 2], [3]], id="ragged"),
+        pytest.param([[1], 2], [[1], 2], id="mixed_depths"),
+        pytest.param([[1, 2]], [[1], [2]], id="shape_mismatch"),
+    ],
+)
+def test_add_elementwise_rejects_irregular_shapes(a, b):
+    """Ragged inputs and inputs of different shapes raise ValueError."""
+    with pytest.raises(ValueError):
+        add_elementwise(a, b)
+
+
+async def _agen(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.parametrize(
+    "items,kwargs,expected",
+    [
+        pytest.param(range(5000), {}, sum(range(5000)), id="ints"),
+        pytest.param("abcdefg", {}, "abcdefg", id="strings_in_order"),
+        pytest.param(
+            [[1], [2, 3]], {"start": [0]}, [0, 1, 2, 3], id="lists_with_start"
+        ),
+        pytest.param([], {"start": 7}, 7, id="empty_with_start"),
+        pytest.param([1j, 2, 3j], {}, 2 + 4j, id="unorderable"),
+    ],
+)
+def test_sum_async(items, kwargs, expected):
+    """sum_async reduces an async iterable in batches, keeping the order."""
+    total = asyncio.run(sum_async(_agen(items), batch_size=3, **kwargs))
+    assert total == expected
+
+
+def test_sum_async_empty_raises():
+    """An empty async iterable without a start value raises TypeError."""
+    with pytest.raises(TypeError):
+        asyncio.run(sum_async(_agen([])))
+
+
+def test_async_accumulator_running_total_and_cancellation():
+    """Running totals are visible while consuming, and cancelling keeps
+    the values that were not reduced yet pending."""
+
+    async def scenario():
+        queue = asyncio.Queue(maxsize=4)
+
+        async def values():
+            while True:
+                yield await queue.get()
+
+        accumulator = AsyncAccumulator(batch_size=3)
+        consumer = asyncio.create_task(accumulator.consume(values()))
+        for value in range(10):
+            await queue.put(value)
+        await asyncio.sleep(0.01)
+        assert accumulator.running_total() == sum(range(9))
+        assert accumulator.pending == 1
+
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+        assert await accumulator.result() == sum(range(10))
+        assert (accumulator.count, accumulator.min, accumulator.max) == (10, 0, 9)
+
+    asyncio.run(scenario())
+
+
+def test_async_accumulator_offloads_slow_batches():
+    """Batches over the time budget are reduced in the executor."""
+
+    async def scenario():
+        accumulator = AsyncAccumulator(batch_size=10, budget=0.0)
+        await accumulator.consume(_agen(range(100)))
+        return await accumulator.result()
+
+    assert asyncio.run(scenario()) == sum(range(100))
+
+
+@pytest.mark.parametrize("budget", [1.0, 0.0], ids=["inline", "executor"])
+def test_async_accumulator_unorderable_values(budget):
+    """Unorderable values are reduced without tracking min and max."""
+
+    async def scenario():
+        accumulator = AsyncAccumulator(batch_size=2, budget=budget)
+        await accumulator.consume(_agen([1, 2, 1j, 3]))
+        return accumulator, await accumulator.result()
+
+    accumulator, total = asyncio.run(scenario())
+    assert total == 6 + 1j
+    assert (accumulator.count, accumulator.min, accumulator.max) == (4, None, None)
+
+
+class _ExpensiveSum:
+    """Hashable operand counting how often it is added."""
+
+    additions = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __add__(self, other):
+        _ExpensiveSum.additions += 1
+        return _ExpensiveSum(self.value + other.value)
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+
+def test_cached_sum_hits_evicts_and_invalidates():
+    """Repeated pairs are served from the cache in LRU order."""
+    cached = CachedSum(maxsize=2)
+    one, two, three = map(_ExpensiveSum, (1, 2, 3))
+    before = _ExpensiveSum.additions
+    assert cached(one, two).value == 3
+    assert cached(one, two).value == 3
+    assert _ExpensiveSum.additions == before + 1
+
+    cached(two, three)
+    cached(one, two)
+    cached(three, three)  # evicts (two, three), the least recently used
+    stats = cached.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1)
+    assert stats["size"] == 2
+
+    assert cached.invalidate(one) == 1
+    assert cached.invalidate(three, three) == 1
+    assert cached.stats()["size"] == 0
+
+
+def test_cached_sum_ttl_and_byte_bound():
+    """Entries expire after ttl seconds, and max_bytes bounds the size."""
+    now = [0.0]
+    cached = CachedSum(ttl=10, timer=lambda: now[0])
+    cached("a", "b")
+    now[0] = 11.0
+    cached("a", "b")
+    assert cached.stats()["expirations"] == 1
+
+    cached = CachedSum(max_bytes=200)
+    for index in range(10):
+        cached("x" * 50, str(index))
+    assert 0 < cached.stats()["bytes"] <= 200
+    assert cached.stats()["evictions"] > 0
+
+
+@pytest.mark.parametrize(
+    "a,b",
+    [
+        pytest.param(5, 0, id="int_plus_zero"),
+        pytest.param(0, Fraction(1, 3), id="zero_plus_fraction"),
+        pytest.param("", "abc", id="empty_str"),
+        pytest.param((1,), (), id="empty_tuple"),
+    ],
+)
+def test_cached_sum_identity_shortcuts(a, b):
+    """Additions of an additive identity skip both the cache and +."""
+    cached = CachedSum()
+    assert cached(a, b) == a + b
+    assert cached.stats()["shortcuts"] == 1
+    assert cached.stats()["size"] == 0
+
+
+def test_cached_sum_bypasses_unhashable_operands():
+    """Unhashable operands are summed without touching the cache."""
+    cached = CachedSum()
+    assert cached([1], [2]) == [1, 2]
+    assert cached(-0.0, 0) == 0.0
+    assert cached(1, 1.0) == 2.0 and type(cached(1, 1)) is int
+    stats = cached.stats()
+    assert stats["bypassed"] == 1
+    assert stats["shortcuts"] == 0
+
+
+@pytest.mark.parametrize(
+    "first,second",
+    [
+        pytest.param(((1,), (2,)), ((1.0,), (2,)), id="nested_types"),
+        pytest.param((-0.0, -0.0), (0.0, 0.0), id="signed_zero"),
+        pytest.param(
+            (complex(0.0, -0.0), complex(0.0, -0.0)), (0j, 0j), id="complex_zero"
+        ),
+    ],
+)
+def test_cached_sum_keys_tell_equal_operands_apart(first, second):
+    """Equal operands whose sums differ never share a cache entry."""
+    cached = CachedSum()
+    for a, b in (first, second):
+        assert repr(cached(a, b)) == repr(a + b)
+
+
+def test_concurrent_sum_threads():
+    """Additions from many threads are all counted, and reset keeps start."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    total = ConcurrentSum(start=100)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in pool.map(
+            lambda chunk: [total.add(n) for n in chunk], [range(1000)] * 16
+        ):
+            pass
+    assert total.snapshot() == 100 + 16 * sum(range(1000))
+
+    total.reset()
+    assert total.snapshot() == 100
+    total.add(5)
+    assert total.snapshot() == 105
+
+
+def test_concurrent_sum_empty_raises():
+    """Reading an empty sum without a start value raises TypeError."""
+    with pytest.raises(TypeError):
+        ConcurrentSum().snapshot()
+
+
+_SERIES_A = ([1, 2, 4, 6], [10, 20, 40, 60])
+_SERIES_B = ([2, 3, 6, 7], [1, 2, 3, 4])
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected",
+    [
+        pytest.param(
+            {}, ([1, 2, 3, 4, 6, 7], [10, 21, 2, 40, 63, 4]), id="outer_pass_through"
+        ),
+        pytest.param(
+            {"fill": 100},
+            ([1, 2, 3, 4, 6, 7], [110, 21, 102, 140, 63, 104]),
+            id="outer_fill",
+        ),
+        pytest.param({"how": "inner"}, ([2, 6], [21, 63]), id="inner_skips_gaps"),
+        pytest.param(
+            {"tolerance": 1, "how": "inner"},
+            ([2, 3, 6], [21, 42, 63]),
+            id="nearest_within_tolerance",
+        ),
+    ],
+)
+def test_add_series(kwargs, expected):
+    """Points are merge-joined by timestamp with the chosen gap policy."""
+    assert add_series(_SERIES_A, _SERIES_B, chunk_size=2, **kwargs) == expected
+
+
+def test_add_series_keeps_order_and_duplicates():
+    """Duplicate timestamps match one to one, and operand order is kept."""
+    series_a = ([1, 1, 2], ["a", "b", "c"])
+    series_b = ([1, 2.5], ["x", "y"])
+    assert add_series(series_a, series_b, tolerance=0.5) == (
+        [1, 1, 2],
+        ["ax", "b", "cy"],
+    )
+
+
+@pytest.mark.parametrize("how", ["outer", "inner"])
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_add_series_numpy_keeps_duplicates(how, chunk_size):
+    """The numpy merge matches duplicate timestamps one to one like the
+    Python merge, also when they span chunks."""
+    np = pytest.importorskip("numpy")
+    times_a = np.repeat(np.arange(0, 40, 2), np.arange(20) % 4)
+    times_b = np.repeat(np.arange(0, 40, 3), np.arange(14) % 3 + 1)
+    series_a = times_a, np.arange(len(times_a), dtype=float)
+    series_b = times_b, np.arange(len(times_b), dtype=float) / 100
+
+    times, values = add_series(
+        series_a, series_b, fill=1000, how=how, chunk_size=chunk_size
+    )
+    expected = add_series(
+        tuple(map(list, series_a)), tuple(map(list, series_b)), fill=1000, how=how
+    )
+    assert isinstance(values, np.ndarray)
+    assert times.tolist() == expected[0]
+    assert values.tolist() == expected[1]
+
+
+@pytest.mark.parametrize(
+    "series_a,kwargs",
+    [
+        pytest.param(([2, 1], [0, 0]), {}, id="unsorted"),
+        pytest.param(([1, 2], [0]), {}, id="length_mismatch"),
+        pytest.param(_SERIES_A, {"how": "left"}, id="unknown_how"),
+        pytest.param(_SERIES_A, {"tolerance": -1}, id="negative_tolerance"),
+    ],
+)
+def test_add_series_rejects_bad_input(series_a, kwargs):
+    """Unsorted or malformed series and bad options raise ValueError."""
+    with pytest.raises(ValueError):
+        add_series(series_a, _SERIES_B, **kwargs)
+
+
+@pytest.mark.parametrize("how", ["outer", "inner"])
+def test_add_series_numpy_matches_python(how):
+    """The vectorized numpy merge agrees with the Python merge, chunk
+    boundaries included."""
+    np = pytest.importorskip("numpy")
+    times_a = np.arange(0, 3000, 2)
+    times_b = np.arange(0, 3000, 3)
+    series_a = times_a, np.ones(len(times_a))
+    series_b = times_b, np.full(len(times_b), 0.5)
+
+    times, values = add_series(series_a, series_b, fill=10, how=how, chunk_size=97)
+    expected = add_series(
+        tuple(map(list, series_a)), tuple(map(list, series_b)), fill=10, how=how
+    )
+    assert isinstance(values, np.ndarray)
+    assert times.tolist() == expected[0]
+    assert values.tolist() == expected[1]
+
+
+def test_iter_add_series_streams_chunks():
+    """Chunked input is merged into output chunks of bounded size."""
+    chunks_a = (([n], [1]) for n in range(0, 100, 2))
+    chunks_b = (([n], [1]) for n in range(0, 100, 5))
+    chunks = list(iter_add_series(chunks_a, chunks_b, chunk_size=8))
+    assert max(len(times) for times, _ in chunks) == 8
+    assert sum(sum(values) for _, values in chunks) == 50 + 20
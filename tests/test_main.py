@@ -0,0 +1,113 @@
+import pytest
+from main import main
+
+
+def test_main_without_command(capsys):
+    """Without a subcommand the entry point prints a greeting."""
+    assert main([]) == 0
+    assert "Hello from pytest-minimal-example!" in capsys.readouterr().out
+
+
+def test_main_add_files(tmp_path, capsys):
+    """The add-files subcommand sums two files elementwise."""
+    np = pytest.importorskip("numpy")
+    np.save(tmp_path / "a.npy", np.arange(5))
+    np.save(tmp_path / "b.npy", np.arange(5))
+
+    args = ["add-files", str(tmp_path / "a.npy"), str(tmp_path / "b.npy")]
+    assert main([*args, str(tmp_path / "out.npy")]) == 0
+    assert "Wrote 5 elements" in capsys.readouterr().out
+    assert np.load(tmp_path / "out.npy").tolist() == [0, 2, 4, 6, 8]
+
+
+def test_main_add_files_rejects_no_workers(tmp_path, capsys):
+    """At least one worker thread is needed to sum the files."""
+    args = ["add-files", str(tmp_path / "a.npy"), str(tmp_path / "b.npy")]
+    with pytest.raises(SystemExit) as excinfo:
+        main([*args, str(tmp_path / "out.npy"), "--workers", "0"])
+    assert excinfo.value.code == 2
+    assert "--workers" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "content,options,expected",
+    [
+        pytest.param("1\n2.5\n\n3", [], "6.5", id="newline_delimited"),
+        pytest.param("1 2\n3\n", ["--type", "int"], "6", id="integers"),
+        pytest.param("", [], "0", id="empty"),
+        pytest.param(
+            "name,value\na,1\nb,2\n",
+            ["--column", "1", "--skip-header", "--mode", "kahan"],
+            "3.0",
+            id="csv_column",
+        ),
+        pytest.param("1,2\n3,4\n", [], "4.0", id="csv_first_column_by_default"),
+        pytest.param(
+            "a;1\nb;2\na;0.5\n",
+            ["--delimiter", ";", "--column", "1", "--key-column", "0"],
+            "a;1.5\nb;2.0",
+            id="grouped_by_key",
+        ),
+    ],
+)
+def test_main_sum(tmp_path, capsys, content, options, expected):
+    """The sum subcommand reduces numbers read from files."""
+    path = tmp_path / "numbers.txt"
+    path.write_text(content)
+
+    assert main(["sum", str(path), *options]) == 0
+    captured = capsys.readouterr()
+    assert captured.out.strip() == expected
+    assert "rows/s" in captured.err
+
+
+def test_main_sum_multiple_blocks(tmp_path, capsys, monkeypatch):
+    """Lines split across read blocks are reassembled before parsing."""
+    monkeypatch.setattr("main.READ_BLOCK_SIZE", 7)
+    path = tmp_path / "numbers.txt"
+    path.write_text("".join(f"{n}\n" for n in range(1000)))
+
+    assert main(["sum", str(path), str(path), "--type", "int"]) == 0
+    assert capsys.readouterr().out.strip() == str(2 * sum(range(1000)))
+
+
+@pytest.mark.parametrize("block_size", [8, 1 << 20])
+def test_main_sum_exact_across_blocks(tmp_path, capsys, monkeypatch, block_size):
+    """Exact mode does not round block sums, so the block size is irrelevant."""
+    monkeypatch.setattr("main.READ_BLOCK_SIZE", block_size)
+    path = tmp_path / "numbers.txt"
+    path.write_text("1e16\n1\n1\n")
+
+    assert main(["sum", str(path), "--mode", "exact"]) == 0
+    assert capsys.readouterr().out.strip() == "1.0000000000000002e+16"
+
+
+@pytest.mark.parametrize(
+    "content,options",
+    [
+        pytest.param("value\n1\n", [], id="unskipped_header"),
+        pytest.param("1\n2x\n", ["--type", "int"], id="bad_token"),
+        pytest.param("1,2\n3\n", ["--column", "1"], id="missing_column"),
+        pytest.param("1,a\n", ["--key-column", "2"], id="missing_key_column"),
+    ],
+)
+def test_main_sum_reports_bad_input(tmp_path, capsys, content, options):
+    """Unparsable input is reported in one line instead of a traceback."""
+    path = tmp_path / "numbers.txt"
+    path.write_text(content)
+
+    assert main(["sum", str(path), *options]) == 1
+    err = capsys.readouterr().err
+    assert err.startswith("error: invalid input: ")
+    assert "Traceback" not in err
+
+
+def test_main_sum_rejects_numpy_integers(tmp_path, capsys):
+    """The numpy engine parses float64, so integer sums are rejected."""
+    path = tmp_path / "numbers.txt"
+    path.write_text("1\n2\n")
+
+    with pytest.raises(SystemExit) as excinfo:
+        main(["sum", str(path), "--type", "int", "--engine", "numpy"])
+    assert excinfo.value.code == 2
+    assert "--engine numpy" in capsys.readouterr().err
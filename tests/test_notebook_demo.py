@@ -1,65 +1,195 @@
 """
-Test file demonstrating how to test Jupyter notebooks using pytest-nbval.
+Test file validating the sum_function_demo.ipynb notebook like pytest-nbval.
 
-This file shows different ways to run pytest-nbval tests on our sum_function_demo.ipynb notebook.
+Instead of starting ``pytest --nbval`` subprocesses that each boot a Jupyter
+kernel, the notebook is executed once per session in this process, and both
+the strict and the lax checks are run on that one execution. The outputs are
+cached in the pytest cache, keyed by a hash of the notebook's code cells, of
+lib.py, of this module and of the Python version, so unchanged notebooks are
+validated without executing them. The cache directory is shared, so xdist
+workers reuse each other's executions.
+
+The nbval cell markers ``# NBVAL_IGNORE_OUTPUT``, ``# NBVAL_CHECK_OUTPUT`` and
+``# NBVAL_SKIP`` are honored. Run the notebook with nbval itself with:
+
+    pytest --nbval sum_function_demo.ipynb
 """
 
-import subprocess
+import ast
+import contextlib
+import hashlib
+import io
+import json
 import sys
 from pathlib import Path
 
+import lib
+import pytest
+
+NOTEBOOK_PATH = Path(__file__).parent.parent / "sum_function_demo.ipynb"
+
+_CACHE_KEY = "notebook_demo/outputs"
+
+
+def code_cells(notebook_path):
+    """Return the sources and stored outputs of a notebook's code cells."""
+    notebook = json.loads(Path(notebook_path).read_text(encoding="utf-8"))
+    return [
+        ("".join(cell["source"]), cell.get("outputs", []))
+        for cell in notebook["cells"]
+        if cell["cell_type"] == "code"
+    ]
+
+
+def notebook_hash(sources):
+    """Hash cell sources together with everything else that affects outputs:
+    lib.py, this module, which runs the cells, and the Python version."""
+    digest = hashlib.sha256(Path(lib.__file__).read_bytes())
+    digest.update(hashlib.sha256(Path(__file__).read_bytes()).digest())
+    digest.update(hashlib.sha256(sys.version.encode()).digest())
+    for source in sources:
+        digest.update(hashlib.sha256(source.encode()).digest())
+    return digest.hexdigest()
+
+
+def _run_cell(source, namespace):
+    # Execute a cell like a kernel would, returning its outputs in the
+    # notebook format: printed text as a stream, and the value of a final
+    # expression as an execute_result.
+    stdout, stderr = io.StringIO(), io.StringIO()
+    outputs = []
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            tree = ast.parse(source)
+            last = None
+            if tree.body and isinstance(tree.body[-1], ast.Expr):
+                last = ast.Expression(tree.body.pop().value)
+            exec(compile(tree, "<cell>", "exec"), namespace)
+            value = (
+                None
+                if last is None
+                else eval(compile(last, "<cell>", "eval"), namespace)
+            )
+        except Exception as error:
+            outputs.append(
+                {
+                    "output_type": "error",
+                    "ename": type(error).__name__,
+                    "evalue": str(error),
+                }
+            )
+            value = None
+    streams = [
+        {"output_type": "stream", "name": name, "text": stream.getvalue()}
+        for name, stream in (("stdout", stdout), ("stderr", stderr))
+        if stream.getvalue()
+    ]
+    outputs[:0] = streams
+    if value is not None:
+        outputs.append(
+            {"output_type": "execute_result", "data": {"text/plain": repr(value)}}
+        )
+    return outputs
+
 
-def test_notebook_with_nbval():
+def execute_notebook(sources):
+    """Execute code cell sources in order in one fresh namespace.
+
+    Returns:
+        The list of outputs of each cell
     """
-    Test that demonstrates running pytest-nbval on our notebook.
+    namespace = {"__name__": "__main__"}
+    return [
+        [] if "# NBVAL_SKIP" in source else _run_cell(source, namespace)
+        for source in sources
+    ]
+
+
+def _comparable(outputs):
+    # Merge consecutive streams of the same name and drop metadata, as nbval
+    # does before comparing outputs.
+    merged = []
+    for output in outputs:
+        if output["output_type"] == "stream":
+            text = "".join(output["text"])
+            if merged and merged[-1][:2] == ("stream", output["name"]):
+                merged[-1] = (*merged[-1][:2], merged[-1][2] + text)
+            else:
+                merged.append(("stream", output["name"], text))
+        elif output["output_type"] in ("execute_result", "display_data"):
+            data = output["data"].get("text/plain", "")
+            merged.append(("result", "".join(data)))
+        elif output["output_type"] == "error":
+            merged.append(("error", output["ename"]))
+    return merged
 
-    This test runs pytest-nbval on the sum_function_demo.ipynb notebook
-    and ensures all cells execute successfully with expected outputs.
+
+@pytest.fixture(scope="session")
+def notebook_run(request):
+    """Stored and actual outputs of the notebook's code cells.
+
+    The actual outputs come from the pytest cache if the notebook and lib.py
+    are unchanged since they were cached, and from executing the notebook
+    once otherwise.
     """
-    notebook_path = Path(__file__).parent.parent / "sum_function_demo.ipynb"
+    cells = code_cells(NOTEBOOK_PATH)
+    sources = [source for source, _ in cells]
+    key = notebook_hash(sources)
+    cache = getattr(request.config, "cache", None)
+    cached = cache.get(_CACHE_KEY, None) if cache is not None else None
+    if cached is not None and cached["hash"] == key:
+        actual = cached["outputs"]
+    else:
+        actual = execute_notebook(sources)
+        if cache is not None:
+            cache.set(_CACHE_KEY, {"hash": key, "outputs": actual})
+    return [
+        (source, expected, outputs)
+        for (source, expected), outputs in zip(cells, actual)
+    ]
 
-    # Run pytest-nbval on the notebook
-    result = subprocess.run(
-        [sys.executable, "-m", "pytest", "--nbval", str(notebook_path)],
-        capture_output=True,
-        text=True,
-    )
 
-    # Check that the test passed
-    assert result.returncode == 0, (
-        f"Notebook test failed:\n{result.stdout}\n{result.stderr}"
-    )
+def _check_no_errors(notebook_run):
+    for index, (source, _, outputs) in enumerate(notebook_run):
+        errors = [output for output in outputs if output["output_type"] == "error"]
+        assert not errors, f"code cell {index} raised {errors[0]}:\n{source}"
 
-    # Verify that tests were actually run
-    assert "passed" in result.stdout
-    assert str(notebook_path.name) in result.stdout
 
+def test_notebook_with_nbval(notebook_run):
+    """
+    Test that the notebook runs and reproduces its stored outputs.
 
-def test_notebook_with_nbval_ignore_output():
+    Like ``pytest --nbval``, every cell not marked ``# NBVAL_IGNORE_OUTPUT``
+    must produce exactly the outputs stored in the notebook.
     """
-    Test that demonstrates running pytest-nbval with --nbval-lax option.
+    _check_no_errors(notebook_run)
+    for index, (source, expected, outputs) in enumerate(notebook_run):
+        if "# NBVAL_IGNORE_OUTPUT" in source or "# NBVAL_SKIP" in source:
+            continue
+        assert _comparable(outputs) == _comparable(expected), (
+            f"code cell {index} output differs:\n{source}"
+        )
 
-    The --nbval-lax option only checks that cells execute without error,
-    but ignores output differences. This is useful for notebooks with
+
+def test_notebook_with_nbval_ignore_output(notebook_run):
+    """
+    Test that the notebook runs without errors, like ``pytest --nbval-lax``.
+
+    Lax checking ignores output differences, except in cells marked
+    ``# NBVAL_CHECK_OUTPUT``. This is useful for notebooks with
     non-deterministic outputs.
     """
-    notebook_path = Path(__file__).parent.parent / "sum_function_demo.ipynb"
-
-    # Run pytest-nbval with lax checking
-    result = subprocess.run(
-        [sys.executable, "-m", "pytest", "--nbval-lax", str(notebook_path)],
-        capture_output=True,
-        text=True,
-    )
-
-    # Check that the test passed
-    assert result.returncode == 0, (
-        f"Notebook lax test failed:\n{result.stdout}\n{result.stderr}"
-    )
-
-
-if __name__ == "__main__":
-    # This allows running the test directly
-    test_notebook_with_nbval()
-    test_notebook_with_nbval_ignore_output()
-    print("All notebook tests passed!")
+    _check_no_errors(notebook_run)
+    for index, (source, expected, outputs) in enumerate(notebook_run):
+        if "# NBVAL_CHECK_OUTPUT" in source:
+            assert _comparable(outputs) == _comparable(expected), (
+                f"code cell {index} output differs:\n{source}"
+            )
+
+
+def test_execute_notebook_captures_outputs():
+    """Printed text, final expression values and errors are recorded."""
+    outputs = execute_notebook(["x = 2\nprint(x)\nx + 1", "1 / 0", "# NBVAL_SKIP\n1"])
+    assert _comparable(outputs[0]) == [("stream", "stdout", "2\n"), ("result", "3")]
+    assert _comparable(outputs[1]) == [("error", "ZeroDivisionError")]
+    assert outputs[2] == []